@@ -0,0 +1,146 @@
+import json, os, pickle
+import pynse
+import datetime as dt
+import numpy as np
+import pandas as pd
+from pynse.core import parse_option_chain, parse_quotes
+
+# moneycontrol tblList headers, 'High Low' and 'Open Int Chg' hold two values separated by a <br>
+mcColumns = {
+    'options': ['Symbol', 'Expiry Date', 'Option Type', 'Strike Price', 'Last Price', 'Change', '% Chg', 'High Low', 'Volume (Contracts)', 'Value (Rs. Lakh)', 'Open Int', 'Open Int Chg'],
+    'futures': ['Symbol', 'Expiry Date', 'Last Price', 'Change', '% Chg', 'High Low', 'Volume (Contracts)', 'Value (Rs. Lakh)', 'Open Int', 'Open Int Chg']
+}
+recordedDir = os.path.join(os.path.dirname(__file__), 'fixtures', 'recorded')
+
+def nextExpiries(count: int, today: dt.date = dt.date(2022, 4, 1)) -> list:
+    '''
+    Returns the last Thursdays of count months from the month of today.
+    '''
+    expiries = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        nextMonth = dt.date(year + month // 12, month % 12 + 1, 1)
+        lastDay = nextMonth - dt.timedelta(days=1)
+        expiries.append(lastDay - dt.timedelta(days=(lastDay.weekday() - 3) % 7))
+        year, month = nextMonth.year, nextMonth.month
+    return expiries
+
+def fnoSymbols(count: int) -> list:
+    '''
+    Returns count stock names, the F&O symbols shipped with pynse first and SYM000.. after them. pynse only accepts the extra names once they are added to Nse.symbols['FnO'].
+    '''
+    with open(os.path.join(os.path.dirname(pynse.__file__), 'symbol_list', 'FnO.pkl'), 'rb') as f:
+        names = list(pickle.load(f))[:count]
+    return names + [f'SYM{i:03d}' for i in range(count - len(names))]
+
+def syntheticFixtures(symbols: int = 50, strikes: int = 40, expiries: int = 2, seed: int = 0, names: list = None) -> dict:
+    '''
+    Returns fixtures shaped like the recorded ones for symbols stocks with strikes strikes per expiry: the raw option chain json, quotes, market status and moneycontrol pages. The stocks are named SYM000.. unless names are given. The same arguments always give the same fixtures.
+    '''
+    rng = np.random.RandomState(seed)
+    names = list(names) if names is not None else [f'SYM{i:03d}' for i in range(symbols)]
+    symbols = len(names)
+    expiryDates = nextExpiries(expiries)
+    opens = dict(zip(names, rng.uniform(100, 3000, symbols).round(1)))
+    optionChains, mcOptions, mcFutures = {}, [], []
+    for name in names:
+        # strikes about 1% of the price apart, centered on the open
+        step = max(5, round(opens[name] / 500) * 5)
+        strikePrices = (round(opens[name] / step) + np.arange(strikes) - strikes // 2) * step
+        records = []
+        for expiry in expiryDates:
+            expiryText = expiry.strftime('%d-%b-%Y')
+            for strike in strikePrices:
+                record = {'strikePrice': float(strike), 'expiryDate': expiryText}
+                for side in ('PE', 'CE'):
+                    # deep out of the money strikes often have no contract on one side
+                    if rng.rand() < 0.05:
+                        continue
+                    record[side] = _syntheticSide(rng, name, expiryText, float(strike), opens[name])
+                records.append(record)
+                for side in ('CE', 'PE'):
+                    mcOptions.append([name, expiry.strftime('%d-%b-%y'), side, f'{strike:.2f}', *_syntheticMcValues(rng)])
+            mcFutures.append([name, expiry.strftime('%d-%b-%y'), *_syntheticMcValues(rng)])
+        optionChains[name] = {'records': {'expiryDates': [e.strftime('%d-%b-%Y') for e in expiryDates], 'data': records, 'timestamp': '01-Apr-2022 15:30:00'}}
+    quotes = {'data': [{'symbol': name, 'open': opens[name], 'lastPrice': opens[name], 'dayHigh': opens[name] * 1.01, 'dayLow': opens[name] * 0.99, 'previousClose': opens[name], 'pChange': 0.} for name in names]}
+    marketStatus = {'marketState': [{'market': 'Capital Market', 'marketStatus': 'Open', 'tradeDate': '01-Apr-2022'}]}
+    return {
+        'source': f'synthetic symbols={symbols} strikes={strikes} expiries={expiries} seed={seed}',
+        'optionChains': optionChains,
+        'quotes': quotes,
+        'marketStatus': marketStatus,
+        'mcPages': {'options': mcPage('options', mcOptions), 'futures': mcPage('futures', mcFutures)}
+    }
+
+def _syntheticSide(rng, name: str, expiryText: str, strike: float, underlying: float) -> dict:
+    oi = int(rng.randint(0, 20000))
+    return {
+        'strikePrice': strike, 'expiryDate': expiryText, 'underlying': name, 'identifier': f'OPTSTK{name}{expiryText}{strike}',
+        'openInterest': oi, 'changeinOpenInterest': int(rng.randint(-oi, oi + 1)), 'pchangeinOpenInterest': float(rng.uniform(-100, 100)),
+        'totalTradedVolume': int(rng.randint(0, 50000)), 'impliedVolatility': float(rng.uniform(0, 80)), 'lastPrice': float(rng.uniform(0, 100)),
+        'change': float(rng.uniform(-20, 20)), 'pChange': float(rng.uniform(-60, 60)), 'totalBuyQuantity': int(rng.randint(0, 100000)),
+        'totalSellQuantity': int(rng.randint(0, 100000)), 'bidQty': int(rng.randint(0, 5000)), 'bidprice': float(rng.uniform(0, 100)),
+        'askQty': int(rng.randint(0, 5000)), 'askPrice': float(rng.uniform(0, 100)), 'underlyingValue': underlying
+    }
+
+def _syntheticMcValues(rng) -> list:
+    '''
+    Returns the cells after Symbol..Strike Price of a moneycontrol row, formatted like the site.
+    '''
+    last = rng.uniform(1, 500)
+    return [f'{last:,.2f}', f'{rng.uniform(-20, 20):.2f}', f'{rng.uniform(-30, 30):.2f}', f'{last * 1.1:,.2f}<br>{last * 0.9:,.2f}',
+            f'{rng.randint(0, 10**6):,}', f'{rng.uniform(0, 10**5):,.2f}', f'{rng.randint(0, 10**7):,}', f'{rng.randint(-10**5, 10**5):,}<br>{rng.uniform(-50, 50):.2f}%']
+
+def mcPage(instrument: str, rows: list) -> str:
+    '''
+    Returns a page with the rows in a tblList table, with some markup before and after it like the real page.
+    '''
+    header = ''.join(f'<th>{col}</th>' for col in mcColumns[instrument])
+    body = ''.join('<tr>' + ''.join(f'<td>{cell}</td>' for cell in row) + '</tr>' for row in rows)
+    filler = '<div class="nav"><a href="#">link</a></div>' * 200
+    return f'<html><head><title>moneycontrol</title></head><body>{filler}<table class="tblList"><tr>{header}</tr>{body}</table>{filler}</body></html>'
+
+def loadRecorded(directory: str = recordedDir) -> dict:
+    '''
+    Returns the fixtures recorded by benchmarks.record in directory, in the same shape as syntheticFixtures. Returns None when nothing was recorded.
+    '''
+    if not os.path.exists(os.path.join(directory, 'quotes.json')):
+        return None
+    def read(*path):
+        with open(os.path.join(directory, *path), 'r', encoding='utf-8') as f:
+            return f.read()
+    chainsDir = os.path.join(directory, 'option_chain')
+    return {
+        'source': f'recorded {read("recorded_at.txt").strip()}',
+        'optionChains': {name[:-len('.json')]: json.loads(read('option_chain', name)) for name in sorted(os.listdir(chainsDir))},
+        'quotes': json.loads(read('quotes.json')),
+        'marketStatus': json.loads(read('market_status.json')),
+        'mcPages': {instrument: read('moneycontrol', f'{instrument}.html') for instrument in ('options', 'futures')}
+    }
+
+class FixtureNse:
+    '''
+    Stands in for pynse.Nse, answering from fixtures instead of the network. option_chain parses the raw json with the same code as pynse.
+    '''
+    def __init__(self, fixtures: dict) -> None:
+        self.fixtures = fixtures
+
+    def market_status(self) -> dict:
+        return self.fixtures['marketStatus']
+
+    def get_quotes(self, index=None) -> pd.DataFrame:
+        return parse_quotes(self.fixtures['quotes']['data'])
+
+    def get_quote(self, symbol: str) -> dict:
+        return self.get_quotes().loc[symbol].to_dict()
+
+    def option_chain(self, symbol: str, expiry=None, fields: list = None) -> pd.DataFrame:
+        records = self.fixtures['optionChains'][symbol]['records']
+        return parse_option_chain(records['data'], expiry, fields)
+
+def expiriesOf(fixtures: dict) -> list:
+    '''
+    Returns the expiry dates present in the option chains of fixtures.
+    '''
+    records = next(iter(fixtures['optionChains'].values()))['records']
+    return sorted(dt.datetime.strptime(expiry, '%d-%b-%Y').date() for expiry in records['expiryDates'])
@@ -0,0 +1,82 @@
+'''
+Runs the full processInput loop of main.py against a local replay server, to measure cycle time and throughput offline:
+
+    python -m benchmarks.loadtest --symbols 250 --cycles 3 --latency-ms 80 --jitter-ms 40 --output benchmarks/results/loadtest.json
+
+The Nse of market.nse reads PYNSE_HOST when it is created on first use, so this has to run before anything else used it.
+'''
+import argparse, json, logging, os, tempfile, time
+import numpy as np
+from benchmarks.fixtures import syntheticFixtures, fnoSymbols, expiriesOf
+from benchmarks.replay import ReplayServer
+
+def runLoadTest(symbols: int = 200, cycles: int = 3, strikes: int = 40, expiries: int = 1, latencyMs: float = 0, jitterMs: float = 0, errorRate: float = 0, rateLimit: float = 0, inputOverrides: dict = {}) -> dict:
+    '''
+    Serves synthetic fixtures of symbols stocks and runs cycles cycles of main.processInput against them, writing to a temporary openpyxl workbook. Returns the cycle timings, the replay server stats and the stage metrics of the last cycle.
+    '''
+    names = fnoSymbols(symbols)
+    fixtures = syntheticFixtures(strikes=strikes, expiries=expiries, names=names)
+    server = ReplayServer(fixtures, port=0, latencyMs=latencyMs, jitterMs=jitterMs, errorRate=errorRate, rateLimit=rateLimit).start()
+    os.environ['PYNSE_HOST'] = os.environ['MONEYCONTROL_HOST'] = server.url
+    import main
+    from metrics.metrics import metrics
+    if main.nse.nse is not None:
+        logging.warning('Nse was created before the replay host was set, requests go to the configured host')
+    # accept the synthetic names beyond the shipped F&O list
+    symbolLists = main.nse.getNse().symbols
+    symbolLists['FnO'] = symbolLists['FnO'] | frozenset(names)
+    outputDir = tempfile.mkdtemp(prefix='fno_loadtest_')
+    main.input = {
+        **main.defaultInput,
+        'output_excel_file': os.path.join(outputDir, 'Output.xlsx'),
+        'output_backend': 'openpyxl',
+        # the replay server throttles with rateLimit, the client only slows down when it gets 429s
+        'nse_requests_per_sec': 0,
+        'expiry_date': expiriesOf(fixtures)[0].strftime('%d-%b-%y'),
+        'moneycontrol': {**main.defaultInput['moneycontrol'], 'host': server.url, 'cache_ttl_secs': 0},
+        'stocks': {**main.defaultInput['stocks'], 'names': names},
+        **inputOverrides
+    }
+    cycleSecs = []
+    try:
+        for _ in range(cycles):
+            start = time.perf_counter()
+            main.processInput()
+            if main.outputWriter is not None:
+                main.outputWriter.flush()
+            cycleSecs.append(time.perf_counter() - start)
+            stages = metrics.endCycle()
+    finally:
+        main.shutdownOutputWriter()
+        server.stop()
+    return {
+        'meta': {'symbols': symbols, 'strikes': strikes, 'expiries': expiries, 'cycles': cycles, 'latency_ms': latencyMs, 'jitter_ms': jitterMs, 'error_rate': errorRate, 'rate_limit': rateLimit, 'input': dict(inputOverrides)},
+        'cycle_s': {'min': round(min(cycleSecs), 6), 'median': round(float(np.median(cycleSecs)), 6), 'max': round(max(cycleSecs), 6)},
+        'symbols_per_s': round(symbols / float(np.median(cycleSecs)), 3),
+        'server': server.stats,
+        'stages': {stage: {key: round(value, 6) for key, value in summary.items()} for stage, summary in stages.items()}
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='load tests main.processInput against a local replay server')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--strikes', type=int, default=40)
+    parser.add_argument('--expiries', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--rate-limit', type=float, default=0, help='requests per second, 0 for no limit')
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--batched', action='store_true', help='use batched_compute')
+    parser.add_argument('--output', help='file the results are written to')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    report = runLoadTest(args.symbols, args.cycles, args.strikes, args.expiries, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit,
+                         {'max_in_flight_requests': args.max_in_flight, 'batched_compute': args.batched})
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
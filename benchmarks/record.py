@@ -0,0 +1,40 @@
+'''
+Records the live NSE and moneycontrol responses the pipeline reads into benchmarks/fixtures/recorded, run it during market hours:
+
+    python -m benchmarks.record INFY TCS SBIN
+
+benchmarks.run uses the recorded fixtures when they exist.
+'''
+import argparse, json, os, shutil
+import datetime as dt
+from pynse import Nse
+from market import moneycontrol
+from benchmarks.fixtures import recordedDir
+
+def record(symbols: list, directory: str = recordedDir) -> None:
+    nse = Nse()
+    tmpDir = directory + '.tmp'
+    shutil.rmtree(tmpDir, ignore_errors=True)
+    os.makedirs(os.path.join(tmpDir, 'option_chain'))
+    os.makedirs(os.path.join(tmpDir, 'moneycontrol'))
+    def write(data, *path):
+        with open(os.path.join(tmpDir, *path), 'w', encoding='utf-8') as f:
+            f.write(data if isinstance(data, str) else json.dumps(data))
+    write(nse.get_json('marketStatus'), 'market_status.json')
+    write(nse.get_json('symbol_list', index='SECURITIES%20IN%20F%26O'), 'quotes.json')
+    for symbol in symbols:
+        path = 'option_chain_index' if 'NIFTY' in symbol else 'option_cahin_equities'
+        write(nse.get_json(path, symbol=symbol), 'option_chain', f'{symbol}.json')
+    for instrument, page in (('options', moneycontrol.stockOptsPage), ('futures', moneycontrol.stockFutPage)):
+        html = moneycontrol._fetchPage(page['url'], moneycontrol.commonHeaders, moneycontrol.requestTimeoutSecs)
+        write(html.decode('utf-8', errors='replace'), 'moneycontrol', f'{instrument}.html')
+    write(dt.datetime.now().isoformat(timespec='seconds'), 'recorded_at.txt')
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmpDir, directory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='records NSE and moneycontrol responses as benchmark fixtures')
+    parser.add_argument('symbols', nargs='+', help='F&O symbols whose option chains are recorded')
+    parser.add_argument('--directory', default=recordedDir)
+    args = parser.parse_args()
+    record(args.symbols, args.directory)
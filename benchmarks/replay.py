@@ -0,0 +1,173 @@
+'''
+Local stand-in for the NSE api and the moneycontrol pages, serving recorded or synthetic fixtures with configurable latency, jitter, errors and rate limiting:
+
+    python -m benchmarks.replay --port 8765 --symbols 200 --latency-ms 80 --jitter-ms 40 --error-rate 0.01 --rate-limit 50
+
+Point the pipeline at it with PYNSE_HOST=http://127.0.0.1:8765 and MONEYCONTROL_HOST=http://127.0.0.1:8765 (or moneycontrol.host in config.yaml).
+'''
+import argparse, json, logging, random, threading, time
+import datetime as dt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+from benchmarks.fixtures import syntheticFixtures, loadRecorded, recordedDir, fnoSymbols
+
+class ReplayServer(ThreadingHTTPServer):
+    '''
+    Serves fixtures (see benchmarks.fixtures) like NSE and moneycontrol do. API requests without the cookie set by the homepage get 401, like NSE.
+    Every response is delayed by latencyMs plus up to jitterMs, errorRate of the requests fail with a 503 and requests beyond rateLimit per second (0 for no limit) get a 429 with Retry-After.
+    stats counts the requests, errors and throttled requests per endpoint.
+    '''
+    daemon_threads = True
+    cookie = 'nsit=replay'
+
+    def __init__(self, fixtures: dict, port: int = 8765, host: str = '127.0.0.1', latencyMs: float = 0, jitterMs: float = 0, errorRate: float = 0, rateLimit: float = 0, seed: int = 0) -> None:
+        super().__init__((host, port), ReplayHandler)
+        self.fixtures = fixtures
+        self.latencyMs = latencyMs
+        self.jitterMs = jitterMs
+        self.errorRate = errorRate
+        self.rateLimit = rateLimit
+        self.stats: dict = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(rateLimit)
+        self._refilledAt = time.monotonic()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'ReplayServer':
+        '''
+        Serves from a daemon thread and returns the server.
+        '''
+        self._thread = threading.Thread(target=self.serve_forever, name='replay-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def count(self, endpoint: str, outcome: str) -> None:
+        with self._lock:
+            endpointStats = self.stats.setdefault(endpoint, {'requests': 0, 'errors': 0, 'throttled': 0})
+            endpointStats['requests'] += 1
+            if outcome != 'ok':
+                endpointStats[outcome] += 1
+
+    def admit(self) -> tuple:
+        '''
+        Returns whether the request is throttled, whether it fails and the seconds it is delayed.
+        '''
+        with self._lock:
+            throttled = False
+            if self.rateLimit:
+                now = time.monotonic()
+                self._tokens = min(float(self.rateLimit), self._tokens + (now - self._refilledAt) * self.rateLimit)
+                self._refilledAt = now
+                throttled = self._tokens < 1
+                if not throttled:
+                    self._tokens -= 1
+            failed = self._random.random() < self.errorRate
+            delay = (self.latencyMs + self._random.uniform(0, self.jitterMs)) / 1000
+        return throttled, failed, delay
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug(f'replay: {format % args}')
+
+    def _send(self, status: int, body: bytes, contentType: str = 'application/json', headers: dict = {}) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server: ReplayServer = self.server
+        url = parse.urlsplit(self.path)
+        query = dict(parse.parse_qsl(url.query))
+        endpoint, handler = self.route(url.path, query)
+        throttled, failed, delay = server.admit()
+        time.sleep(delay)
+        if throttled:
+            server.count(endpoint, 'throttled')
+            self._send(429, b'{"message": "too many requests"}', headers={'Retry-After': '1'})
+        elif failed:
+            server.count(endpoint, 'errors')
+            self._send(503, b'{"message": "service unavailable"}')
+        elif url.path.startswith('/api/') and server.cookie not in (self.headers.get('Cookie') or ''):
+            server.count(endpoint, 'errors')
+            self._send(401, b'{"message": "unauthorized"}')
+        else:
+            status, body, contentType, headers = handler(query)
+            server.count(endpoint, 'ok' if status == 200 else 'errors')
+            self._send(status, body, contentType, headers)
+
+    def route(self, path: str, query: dict) -> tuple:
+        fixtures = self.server.fixtures
+        if path == '/':
+            return 'homepage', lambda q: (200, b'<html></html>', 'text/html', {'Set-Cookie': f'{self.server.cookie}; Max-Age=300; Path=/'})
+        if path == '/api/marketStatus':
+            return 'market_status', lambda q: self.json(fixtures['marketStatus'])
+        if path == '/api/equity-stockIndices':
+            return 'symbol_list', lambda q: self.json(fixtures['quotes'])
+        if path == '/api/quote-equity':
+            return ('trade_info' if query.get('section') == 'trade_info' else 'quote_eq'), self.quote
+        if path in ('/api/option-chain-equities', '/api/option-chain-indices'):
+            return 'option_chain', lambda q: self.json(fixtures['optionChains'].get(q.get('symbol')))
+        if path.endswith('homebody.php'):
+            instrument = 'options' if '/options/' in path else 'futures'
+            return f'moneycontrol.{instrument}', lambda q: (200, fixtures['mcPages'][instrument].encode('utf-8'), 'text/html; charset=utf-8', {})
+        return 'unknown', lambda q: (404, b'{}', 'application/json', {})
+
+    @staticmethod
+    def json(data) -> tuple:
+        if data is None:
+            return 404, b'{}', 'application/json', {}
+        return 200, json.dumps(data).encode(), 'application/json', {}
+
+    def quote(self, query: dict) -> tuple:
+        quotes = {quote['symbol']: quote for quote in self.server.fixtures['quotes']['data']}
+        quote = quotes.get(query.get('symbol'))
+        if quote is None:
+            return self.json(None)
+        if query.get('section') == 'trade_info':
+            return self.json({'securityWiseDP': {'quantityTraded': 0, 'deliveryQuantity': 0, 'deliveryToTradedQuantity': 0}})
+        return self.json({
+            'priceInfo': {'open': quote['open'], 'lastPrice': quote['lastPrice'], 'previousClose': quote['previousClose'], 'pChange': quote['pChange'], 'intraDayHighLow': {'min': quote['dayLow'], 'max': quote['dayHigh']}},
+            'metadata': {'symbol': quote['symbol'], 'series': 'EQ', 'lastUpdateTime': dt.datetime.now().strftime('%d-%b-%Y %H:%M:%S')}
+        })
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='serves NSE and moneycontrol fixtures locally')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--symbols', type=int, default=150, help='synthetic symbols, named after the F&O symbols shipped with pynse')
+    parser.add_argument('--strikes', type=int, default=40, help='synthetic strikes per expiry')
+    parser.add_argument('--expiries', type=int, default=2, help='synthetic expiries')
+    parser.add_argument('--synthetic', action='store_true', help='use synthetic fixtures even if recorded ones exist')
+    parser.add_argument('--fixtures', default=recordedDir, help='directory of recorded fixtures')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--rate-limit', type=float, default=0, help='requests per second, 0 for no limit')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    fixtures = None if args.synthetic else loadRecorded(args.fixtures)
+    fixtures = fixtures or syntheticFixtures(strikes=args.strikes, expiries=args.expiries, names=fnoSymbols(args.symbols))
+    server = ReplayServer(fixtures, args.port, latencyMs=args.latency_ms, jitterMs=args.jitter_ms, errorRate=args.error_rate, rateLimit=args.rate_limit)
+    logging.info(f'replaying {fixtures["source"]} at {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info(f'stats: {json.dumps(server.stats, sort_keys=True)}')
+        server.server_close()
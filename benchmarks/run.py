@@ -0,0 +1,130 @@
+'''
+Times the stages of the pipeline offline, on the fixtures recorded by benchmarks.record or on synthetic ones:
+
+    python -m benchmarks.run --symbols 200 --strikes 60 --output benchmarks/results/local.json
+    python -m benchmarks.run --baseline benchmarks/results/local.json
+
+Results are written as JSON with sorted keys and rounded timings so runs can be diffed, with --baseline the run is compared to an earlier result and the exit code is 1 when a stage got slower than --threshold times its baseline.
+'''
+import argparse, json, logging, os, platform, subprocess, sys, time
+import numpy as np
+import pandas as pd
+from pynse import Nse
+from benchmarks.fixtures import FixtureNse, syntheticFixtures, loadRecorded, expiriesOf, recordedDir
+from market import nse, moneycontrol
+from calculations.calculations import calculateAndUpdateOptionChainDf, getSupportResistancePricesCePe, createOptionsDashboardDf, createFuturesDashboardDf, \
+    stackOptionChains, getSupportResistancePricesBatch, createOptionsDashboardDfBatch, createFuturesDashboardDfBatch
+
+def timeStage(fn, repeat: int) -> dict:
+    '''
+    Runs fn once to warm up and then repeat times, returns the min/median/max seconds of a run.
+    '''
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {'min_s': round(min(timings), 6), 'median_s': round(float(np.median(timings)), 6), 'max_s': round(max(timings), 6), 'repeat': repeat}
+
+def perSymbol(fn, items: dict):
+    return lambda: [fn(key, value) for key, value in items.items()]
+
+def coldStart(repeat: int) -> dict:
+    '''
+    Times a fresh interpreter importing market.nse, and creating an Nse and reading its F&O symbol list.
+    '''
+    repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return {
+        'coldstart.import_market_nse': timeStage(lambda: subprocess.run([sys.executable, '-c', 'import market.nse'], cwd=repoDir, check=True), repeat),
+        'coldstart.Nse': timeStage(lambda: Nse().symbols['FnO'], repeat)
+    }
+
+def runBenchmarks(fixtures: dict, repeat: int = 5, recordsLimitUpperLower: int = 10) -> dict:
+    '''
+    Returns the timings of every stage on fixtures, stages over symbols are timed for all symbols together.
+    '''
+    results = coldStart(repeat)
+    nse.nse = FixtureNse(fixtures)
+    nse.refreshQuoteSnapshot()
+    symbols = sorted(fixtures['optionChains'])
+    expiry = expiriesOf(fixtures)[0]
+    expiryText = expiry.strftime('%d-%b-%y')
+    results['nse.market_status'] = timeStage(nse.capitalMarketStatus, repeat)
+    results['nse.getOptionChains'] = timeStage(lambda: [nse.getOptionChains(symbol, [expiry], recordsLimitUpperLower) for symbol in symbols], repeat)
+    mcDfs = {}
+    for instrument, page in (('options', moneycontrol.stockOptsPage), ('futures', moneycontrol.stockFutPage)):
+        html = fixtures['mcPages'][instrument]
+        results[f'moneycontrol._parseTable.{instrument}'] = timeStage(lambda: moneycontrol._parseTable(html, page['tbl_attr'], page['cols_to_split']), repeat)
+        df = moneycontrol._parseTable(html, page['tbl_attr'], page['cols_to_split'])
+        mcDfs[instrument] = df[df['Expiry Date'] == expiryText]
+        results[f'moneycontrol.indexDataFrame.{instrument}'] = timeStage(lambda: moneycontrol.indexDataFrame(instrument, mcDfs[instrument]), repeat)
+    mcOptsIdx = moneycontrol.indexDataFrame('options', mcDfs['options'])
+    mcFutIdx = moneycontrol.indexDataFrame('futures', mcDfs['futures'])
+
+    chains = {symbol: nse.getOptionChains(symbol, [expiry], recordsLimitUpperLower).get(expiry, pd.DataFrame()) for symbol in symbols}
+    chains = {symbol: df for symbol, df in chains.items() if not df.empty}
+    results['calculateAndUpdateOptionChainDf'] = timeStage(perSymbol(calculateAndUpdateOptionChainDf, chains), repeat)
+    updated = {symbol: calculateAndUpdateOptionChainDf(symbol, df) for symbol, df in chains.items()}
+    results['getSupportResistancePricesCePe'] = timeStage(lambda: [getSupportResistancePricesCePe(df) for df in updated.values()], repeat)
+    results['createOptionsDashboardDf'] = timeStage(perSymbol(lambda symbol, df: createOptionsDashboardDf(symbol, df, mcOptsIdx), updated), repeat)
+    supportResistance = {symbol: getSupportResistancePricesCePe(df) for symbol, df in updated.items()}
+    results['createFuturesDashboardDf'] = timeStage(perSymbol(lambda symbol, sr: createFuturesDashboardDf(symbol, mcFutIdx, sr), supportResistance), repeat)
+
+    def batched():
+        updatedDf = calculateAndUpdateOptionChainDf('', stackOptionChains(chains))
+        createOptionsDashboardDfBatch(updatedDf, mcOptsIdx)
+        createFuturesDashboardDfBatch(mcFutIdx, getSupportResistancePricesBatch(updatedDf))
+    results['batched.allStages'] = timeStage(batched, repeat)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    '''
+    Prints the median of every stage against the baseline, returns the stages slower than threshold times their baseline.
+    '''
+    regressions = []
+    print(f'{"stage":45} {"median_s":>10} {"baseline":>10} {"ratio":>7}')
+    for stage, result in results.items():
+        base = baseline.get('results', {}).get(stage)
+        if base is None or not base['median_s']:
+            print(f'{stage:45} {result["median_s"]:10.6f} {"-":>10} {"-":>7}')
+            continue
+        ratio = result['median_s'] / base['median_s']
+        flag = ' <-- slower' if ratio > threshold else ''
+        print(f'{stage:45} {result["median_s"]:10.6f} {base["median_s"]:10.6f} {ratio:7.2f}{flag}')
+        if ratio > threshold:
+            regressions.append(stage)
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='times the pipeline stages on recorded or synthetic fixtures')
+    parser.add_argument('--symbols', type=int, default=50, help='synthetic symbols')
+    parser.add_argument('--strikes', type=int, default=40, help='synthetic strikes per expiry')
+    parser.add_argument('--expiries', type=int, default=2, help='synthetic expiries')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--synthetic', action='store_true', help='use synthetic fixtures even if recorded ones exist')
+    parser.add_argument('--fixtures', default=recordedDir, help='directory of recorded fixtures')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='file the results are written to')
+    parser.add_argument('--baseline', help='results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25, help='ratio to the baseline median reported as a regression')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    fixtures = None if args.synthetic else loadRecorded(args.fixtures)
+    fixtures = fixtures or syntheticFixtures(args.symbols, args.strikes, args.expiries, args.seed)
+    results = runBenchmarks(fixtures, args.repeat)
+    report = {
+        'meta': {'fixtures': fixtures['source'], 'symbols': len(fixtures['optionChains']), 'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__, 'platform': platform.platform()},
+        'results': results
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        sys.exit(1 if regressions else 0)
+    print(text)
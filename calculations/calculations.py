@@ -1,92 +1,119 @@
-import logging
+import logging, hashlib
 from conditions.conditions import CRITERIASTYPES
 import pandas as pd
-import time, copy
+import datetime as dt
 import numpy as np
+from metrics.metrics import timed
 
+signalColumns = ['PE_WRITING', 'CE_WRITING', 'PE_UNWINDING', 'CE_UNWINDING']
+
+def getActiveCriteria(criteriaType: list, now: dt.time = None) -> dict:
+    '''
+    Returns the criteria from criteriaType whose (start_time, end_time] window contains now, the last criteria is returned when none matches.
+    '''
+    now = now or dt.datetime.now().time()
+    for criteria in criteriaType:
+        if dt.time(*criteria['start_time']) < now <= dt.time(*criteria['end_time']):
+            return criteria
+    return criteriaType[-1]
+
+@timed()
 def calculateAndUpdateOptionChainDf(stockName: str, optionsDf: pd.DataFrame) -> pd.DataFrame:
     '''
     Updates the optionsDf after making calculation on the optionsDf based on writing and unwinding criterias mentioned in the conditions.condtions module.
     '''
     logging.debug('inside calculateAndUpdate')
     optionsDf: pd.DataFrame = optionsDf.copy(deep=True)
-    logging.debug(f'optionsDf: \n{optionsDf}')
-    criteriaTypes = copy.deepcopy(CRITERIASTYPES)
-    for criteriaType in criteriaTypes:
-        for criteria in criteriaType:
-            now = time.localtime()
-            criteria['start_time'] = time.mktime((now[0], now[1], now[2], criteria['start_time'][0], criteria['start_time'][1], criteria['start_time'][2], now[6], now[7], now[8]))
-            criteria['end_time'] = time.mktime((now[0], now[1], now[2], criteria['end_time'][0], criteria['end_time'][1], criteria['end_time'][2], now[6], now[7], now[8]))
-    logging.debug(f'criterias after time updation: {criteriaTypes}')
-    peWriting = []
-    ceWriting  = []
-    peUnwinding = []
-    ceUnwinding = []
-    for _,row in optionsDf.iterrows():
-        writingCriteria = criteriaTypes[0][2]
-        unwindingCriteria = criteriaTypes[1][2]
-        try:
-            writingCriteria = [c for c in criteriaTypes[0] if c['start_time'] < time.time() and time.time() <= c['end_time']][0]
-            unwindingCriteria = [c for c in criteriaTypes[1] if c['start_time'] < time.time() and time.time() <= c['end_time']][0]
-        except IndexError:
-            pass
-        if float(writingCriteria['price_change_percent'])>float(row['PE.pChange']) and float(writingCriteria['oi_change_percent']<float(row['PE.pchangeinOpenInterest'])):
-            peWriting.append('TRUE')
-        else:
-            peWriting.append('FALSE')
-        if float(writingCriteria['price_change_percent'])>float(row['CE.pChange']) and float(writingCriteria['oi_change_percent']<float(row['CE.pchangeinOpenInterest'])):
-            ceWriting.append('TRUE')
-        else:
-            ceWriting.append('FALSE')
-        if float(unwindingCriteria['price_change_percent'])<float(row['PE.pChange']) and float(unwindingCriteria['oi_change_percent']>float(row['PE.pchangeinOpenInterest'])):
-            peUnwinding.append('TRUE')
-        else:
-            peUnwinding.append('FALSE')
-        if float(unwindingCriteria['price_change_percent'])<float(row['CE.pChange']) and float(unwindingCriteria['oi_change_percent']>float(row['CE.pchangeinOpenInterest'])):
-            ceUnwinding.append('TRUE')
-        else:
-            ceUnwinding.append('FALSE')
-    optionsDf['PE_WRITING']=peWriting
-    optionsDf['CE_WRITING']=ceWriting
-    optionsDf['PE_UNWINDING']=peUnwinding
-    optionsDf['CE_UNWINDING']=ceUnwinding
+    logging.debug('optionsDf: \n%s', optionsDf)
+    now = dt.datetime.now().time()
+    writingCriteria = getActiveCriteria(CRITERIASTYPES[0], now)
+    unwindingCriteria = getActiveCriteria(CRITERIASTYPES[1], now)
+    logging.debug(f'active criterias, writing: {writingCriteria}, unwinding: {unwindingCriteria}')
+    columns = {col: pd.to_numeric(optionsDf[col], errors='coerce').to_numpy(dtype=float) for col in ['PE.pChange', 'PE.pchangeinOpenInterest', 'CE.pChange', 'CE.pchangeinOpenInterest']}
+    optionsDf['PE_WRITING'] = (float(writingCriteria['price_change_percent']) > columns['PE.pChange']) & (float(writingCriteria['oi_change_percent']) < columns['PE.pchangeinOpenInterest'])
+    optionsDf['CE_WRITING'] = (float(writingCriteria['price_change_percent']) > columns['CE.pChange']) & (float(writingCriteria['oi_change_percent']) < columns['CE.pchangeinOpenInterest'])
+    optionsDf['PE_UNWINDING'] = (float(unwindingCriteria['price_change_percent']) < columns['PE.pChange']) & (float(unwindingCriteria['oi_change_percent']) > columns['PE.pchangeinOpenInterest'])
+    optionsDf['CE_UNWINDING'] = (float(unwindingCriteria['price_change_percent']) < columns['CE.pChange']) & (float(unwindingCriteria['oi_change_percent']) > columns['CE.pchangeinOpenInterest'])
     return optionsDf
 
-def createOptionsDashboardDf(symbol: str, optionsChainDf:pd.DataFrame, optionsDf: pd.DataFrame) -> pd.DataFrame:
-    '''
-    Returns a dataframe for a stock 'symbol' by collating data from optionsChainDf, optionsDf, futuresDf and supportsResistance dict; that needs to be entered in the dashboard sheet
-    '''
-    filteredOptionsChainDf = optionsChainDf[(optionsChainDf['PE_WRITING'] == 'TRUE') | (optionsChainDf['CE_WRITING'] == 'TRUE') | (optionsChainDf['PE_UNWINDING'] == 'TRUE') | (optionsChainDf['CE_UNWINDING'] == 'TRUE')].copy(deep=True)
-    filteredOptionsChainDf.loc[filteredOptionsChainDf['PE_WRITING'] == 'TRUE', 'PE_WRITING'] = 'PE_WRITING'
-    filteredOptionsChainDf.loc[filteredOptionsChainDf['PE_WRITING'] == 'FALSE', 'PE_WRITING'] = np.NaN
-    filteredOptionsChainDf.loc[filteredOptionsChainDf['PE_UNWINDING'] == 'TRUE', 'PE_UNWINDING'] = 'PE_UNWINDING'
-    filteredOptionsChainDf.loc[filteredOptionsChainDf['PE_UNWINDING'] == 'FALSE', 'PE_UNWINDING'] = np.NaN
-    filteredOptionsChainDf.loc[filteredOptionsChainDf['CE_WRITING'] == 'TRUE', 'CE_WRITING'] = 'CE_WRITING'
-    filteredOptionsChainDf.loc[filteredOptionsChainDf['CE_WRITING'] == 'FALSE', 'CE_WRITING'] = np.NaN
-    filteredOptionsChainDf.loc[filteredOptionsChainDf['CE_UNWINDING'] == 'TRUE', 'CE_UNWINDING'] = 'CE_UNWINDING'
-    filteredOptionsChainDf.loc[filteredOptionsChainDf['CE_UNWINDING'] == 'FALSE', 'CE_UNWINDING'] = np.NaN
-    filteredOptionsChainDf.insert(0, 'Symbol', [symbol]*len(filteredOptionsChainDf))
-    filteredOptionsChainDf = filteredOptionsChainDf.rename(columns={'PE_WRITING': 'Activity1', 'CE_WRITING': 'Activity2', 'PE_UNWINDING': 'Activity3', 'CE_UNWINDING': 'Activity4', 'strikePrice': 'Strike Price'}).reset_index(drop=True)
-    # filteredOptionsChainDf.sort_values('Strike Price')
-    filteredOptionsChainDf = filteredOptionsChainDf[['Symbol', 'Strike Price', 'Activity1', 'Activity2', 'Activity3', 'Activity4']]
-    optionsDf = optionsDf[(optionsDf['Symbol'] == symbol)&(optionsDf['Strike Price'].isin(filteredOptionsChainDf['Strike Price']))][['Strike Price','Option Type','Value (Rs. Lakh)']].reset_index(drop=True).copy(deep=True)
-    optionsDfPeValue = optionsDf[(optionsDf['Option Type'] == 'PE')].rename(columns={'Value (Rs. Lakh)': 'PE.Value'}).drop('Option Type', axis='columns').reset_index(drop=True)
-    optionsDfCeValue = optionsDf[(optionsDf['Option Type'] == 'CE')].rename(columns={'Value (Rs. Lakh)': 'CE.Value'}).drop('Option Type', axis='columns').reset_index(drop=True)
-    optionsDfCePeValue = optionsDfCeValue.join(optionsDfPeValue.set_index('Strike Price'), on='Strike Price', how='left')
-    dashboardDf = filteredOptionsChainDf.join(optionsDfCePeValue.set_index('Strike Price'), on='Strike Price', how='left')
-    dashboardDf.loc[(dashboardDf['Activity1'] != 'PE_WRITING')&(dashboardDf['Activity3'] != 'PE_UNWINDING'), 'PE.Value'] = np.NaN
-    dashboardDf.loc[(dashboardDf['Activity2'] != 'CE_WRITING')&(dashboardDf['Activity4'] != 'CE_UNWINDING'), 'CE.Value'] = np.NaN
+@timed()
+def getFingerprint(symbol: str, optionsDf: pd.DataFrame, mcOptsIdx: pd.DataFrame, mcFutIdx: pd.DataFrame) -> str:
+    '''
+    Returns a hash of everything the calculations of symbol depend on: its option chain, its moneycontrol options and futures rows and the active writing/unwinding criterias. An unchanged fingerprint means the previous results of symbol can be reused.
+    '''
+    now = dt.datetime.now().time()
+    digest = hashlib.sha1(repr([getActiveCriteria(criteriaType, now) for criteriaType in CRITERIASTYPES]).encode())
+    digest.update(pd.util.hash_pandas_object(optionsDf, index=False).to_numpy().tobytes())
+    for mcIdx in (mcOptsIdx, mcFutIdx):
+        try:
+            rows = mcIdx.loc[[symbol]]
+        except KeyError:
+            continue
+        digest.update(pd.util.hash_pandas_object(rows).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def stackOptionChains(optionsChains: dict) -> pd.DataFrame:
+    '''
+    Returns the option chains of a dict of symbol to option chain stacked into one frame with a 'Symbol' column in front, so the whole cycle can be calculated in single passes.
+    '''
+    optionsChains = {symbol: df for symbol, df in optionsChains.items() if not df.empty}
+    if not optionsChains:
+        return pd.DataFrame(columns=['Symbol'])
+    stackedDf = pd.concat(optionsChains, names=['Symbol', None]).reset_index(level=0).reset_index(drop=True)
+    return stackedDf
+
+def lookupOptionValues(mcOptsIdx: pd.DataFrame, symbols, strikePrices, optionType: str) -> np.ndarray:
+    '''
+    Returns 'Value (Rs. Lakh)' for each of strikePrices of symbols (one symbol or one per strike) and optionType from the moneycontrol options frame indexed by moneycontrol.indexDataFrame, NaN where there is no such contract.
+    '''
+    strikePrices = np.asarray(strikePrices, dtype=float)
+    symbols = [symbols]*len(strikePrices) if isinstance(symbols, str) else np.asarray(symbols)
+    keys = pd.MultiIndex.from_arrays([symbols, strikePrices, [optionType]*len(strikePrices)])
+    return mcOptsIdx['Value (Rs. Lakh)'].reindex(keys).to_numpy()
+
+@timed()
+def createOptionsDashboardDf(symbol: str, optionsChainDf:pd.DataFrame, mcOptsIdx: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Returns a dataframe for a stock 'symbol' by collating data from optionsChainDf and the moneycontrol options frame indexed by (Symbol, Strike Price, Option Type), that needs to be entered in the dashboard sheet
+    '''
+    optionsChainDf = optionsChainDf.copy()
+    optionsChainDf.insert(0, 'Symbol', symbol)
+    return createOptionsDashboardDfBatch(optionsChainDf, mcOptsIdx)
+
+@timed()
+def createOptionsDashboardDfBatch(optionsChainDf:pd.DataFrame, mcOptsIdx: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Returns the options dashboard rows of all symbols in optionsChainDf, option chains of one expiry stacked with a 'Symbol' column, in a single pass.
+    '''
+    filteredOptionsChainDf = optionsChainDf[optionsChainDf[signalColumns].any(axis=1)]
+    dashboardDf = pd.DataFrame({
+                        'Symbol'        : filteredOptionsChainDf['Symbol'].to_numpy(),
+                        'Strike Price'  : filteredOptionsChainDf['strikePrice'].to_numpy(),
+                        'Activity1'     : np.where(filteredOptionsChainDf['PE_WRITING'], 'PE_WRITING', None),
+                        'Activity2'     : np.where(filteredOptionsChainDf['CE_WRITING'], 'CE_WRITING', None),
+                        'Activity3'     : np.where(filteredOptionsChainDf['PE_UNWINDING'], 'PE_UNWINDING', None),
+                        'Activity4'     : np.where(filteredOptionsChainDf['CE_UNWINDING'], 'CE_UNWINDING', None)
+                    })
+    ceActive = (filteredOptionsChainDf['CE_WRITING'] | filteredOptionsChainDf['CE_UNWINDING']).to_numpy()
+    peActive = (filteredOptionsChainDf['PE_WRITING'] | filteredOptionsChainDf['PE_UNWINDING']).to_numpy()
+    dashboardDf['CE.Value'] = np.where(ceActive, lookupOptionValues(mcOptsIdx, dashboardDf['Symbol'], dashboardDf['Strike Price'], 'CE'), np.nan)
+    dashboardDf['PE.Value'] = np.where(peActive, lookupOptionValues(mcOptsIdx, dashboardDf['Symbol'], dashboardDf['Strike Price'], 'PE'), np.nan)
     return dashboardDf
 
-def createFuturesDashboardDf(symbol: str, mcFutDf: pd.DataFrame, supportResistancePrices: dict):
+@timed()
+def createFuturesDashboardDf(symbol: str, mcFutIdx: pd.DataFrame, supportResistancePrices: dict):
+    '''
+    Returns the futures dashboard row for symbol from the moneycontrol futures frame indexed by Symbol, the frame is empty when moneycontrol has no future for symbol.
+    '''
+    futures = mcFutIdx.loc[[symbol]] if symbol in mcFutIdx.index else mcFutIdx.iloc[:0]
     futDashboardDf = pd.DataFrame(
                     {
                         'SYMBOL'                        : symbol, 
-                        'LTP'                           : mcFutDf[(mcFutDf['Symbol'] == symbol)]['Last Price'],
-                        'Price Change'                  : mcFutDf[(mcFutDf['Symbol'] == symbol)]['Change'],
-                        'HIGH'                          : mcFutDf[(mcFutDf['Symbol'] == symbol)]['High'],
-                        'LOW'                           : mcFutDf[(mcFutDf['Symbol'] == symbol)]['Low'], 
-                        'FUTURE OI CHG%'                : mcFutDf[(mcFutDf['Symbol'] == symbol)]['OI Change %'], 
+                        'LTP'                           : futures['Last Price'],
+                        'Price Change'                  : futures['Change'],
+                        'HIGH'                          : futures['High'],
+                        'LOW'                           : futures['Low'], 
+                        'FUTURE OI CHG%'                : futures['OI Change %'], 
                         'SUPPORT1'                      : supportResistancePrices['support1'],
                         'SUPPORT2'                      : supportResistancePrices['support2'], 
                         'RESISTANCE1'                   : supportResistancePrices['resistance1'],
@@ -94,43 +121,87 @@ def createFuturesDashboardDf(symbol: str, mcFutDf: pd.DataFrame, supportResistan
                     }).reset_index(drop=True)
     return futDashboardDf
 
+@timed()
+def createFuturesDashboardDfBatch(mcFutIdx: pd.DataFrame, supportResistanceDf: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Returns the futures dashboard rows of all symbols in supportResistanceDf, as returned by getSupportResistancePricesBatch for one expiry and indexed by Symbol, in a single pass. Symbols without a future on moneycontrol or without support/resistance prices are left out.
+    '''
+    supportResistanceDf = supportResistanceDf.dropna()
+    supportResistanceDf = supportResistanceDf[supportResistanceDf.index.isin(mcFutIdx.index)]
+    futures = mcFutIdx.reindex(supportResistanceDf.index)
+    futDashboardDf = pd.DataFrame(
+                    {
+                        'SYMBOL'                        : supportResistanceDf.index.to_numpy(), 
+                        'LTP'                           : futures['Last Price'].to_numpy(),
+                        'Price Change'                  : futures['Change'].to_numpy(),
+                        'HIGH'                          : futures['High'].to_numpy(),
+                        'LOW'                           : futures['Low'].to_numpy(), 
+                        'FUTURE OI CHG%'                : futures['OI Change %'].to_numpy(), 
+                        'SUPPORT1'                      : supportResistanceDf['support1'].to_numpy(),
+                        'SUPPORT2'                      : supportResistanceDf['support2'].to_numpy(), 
+                        'RESISTANCE1'                   : supportResistanceDf['resistance1'].to_numpy(),
+                        'RESISTANCE2'                   : supportResistanceDf['resistance2'].to_numpy()
+                    })
+    return futDashboardDf
+
 def appendToDashboardDF(existingDashboardDf: pd.DataFrame, symbol:str, rawDf: pd.DataFrame, ):
     '''
-    Returns a dataframe concatinating an existing dataframe with filtered rows of either PE_WRITING, CE_WRITING, PE_UNWINDING, CE_UNWINDING set to 'TRUE' in rawDf alongwith the stock symbol, highest and 2nd highest tradevolumes CE/PR strike prices. This function can accept an empty dataframe as well.
+    Returns a dataframe concatinating an existing dataframe with filtered rows of either PE_WRITING, CE_WRITING, PE_UNWINDING, CE_UNWINDING set to True in rawDf alongwith the stock symbol, highest and 2nd highest tradevolumes CE/PR strike prices. This function can accept an empty dataframe as well.
     '''
     logging.debug('inside appendToDashboardDF')
-    logging.debug(f'existingDashboardDf: \n{existingDashboardDf}')
-    logging.debug(f'rawDf: \n{rawDf}')
-    filteredData = rawDf[(rawDf['PE_WRITING'] == 'TRUE') | (rawDf['CE_WRITING'] == 'TRUE') | (rawDf['PE_UNWINDING'] == 'TRUE') | (rawDf['CE_UNWINDING'] == 'TRUE')].copy(deep=True).filter(['strikePrice', 'PE_WRITING', 'PE_UNWINDING', 'CE_WRITING', 'CE_UNWINDING'], axis=1).copy(deep=True)
-    logging.debug(f'filteredData with only TRUE criterias: \n{filteredData}\n{filteredData.info()}')
-    filteredData.loc[filteredData['PE_WRITING'] == 'TRUE', 'PE_WRITING'] = 'PE_WRITING'
-    filteredData.loc[filteredData['PE_WRITING'] == 'FALSE', 'PE_WRITING'] = np.NaN
-    filteredData.loc[filteredData['PE_UNWINDING'] == 'TRUE', 'PE_UNWINDING'] = 'PE_UNWINDING'
-    filteredData.loc[filteredData['PE_UNWINDING'] == 'FALSE', 'PE_UNWINDING'] = np.NaN
-    filteredData.loc[filteredData['CE_WRITING'] == 'TRUE', 'CE_WRITING'] = 'CE_WRITING'
-    filteredData.loc[filteredData['CE_WRITING'] == 'FALSE', 'CE_WRITING'] = np.NaN
-    filteredData.loc[filteredData['CE_UNWINDING'] == 'TRUE', 'CE_UNWINDING'] = 'CE_UNWINDING'
-    filteredData.loc[filteredData['CE_UNWINDING'] == 'FALSE', 'CE_UNWINDING'] = np.NaN
-    logging.debug(f'filteredData after changing TRUE to column names: \n{filteredData}')
+    logging.debug('existingDashboardDf: \n%s', existingDashboardDf)
+    logging.debug('rawDf: \n%s', rawDf)
+    filteredData = rawDf[rawDf[signalColumns].any(axis=1)].filter(['strikePrice', 'PE_WRITING', 'PE_UNWINDING', 'CE_WRITING', 'CE_UNWINDING'], axis=1).copy(deep=True)
+    logging.debug('filteredData with only TRUE criterias: \n%s', filteredData)
+    for col in signalColumns:
+        filteredData[col] = np.where(filteredData[col], col, None)
+    logging.debug('filteredData after changing TRUE to column names: \n%s', filteredData)
     filteredData.insert(0, 'Symbol', [symbol]*len(filteredData))
     # filteredData['Support 1'] = supprtResistancePrices['pePrices'][1]
     # filteredData['Support 2'] = supprtResistancePrices['pePrices'][0]
     # filteredData['Resistance 1'] = supprtResistancePrices['cePrices'][0]
     # filteredData['Resistance 2'] = supprtResistancePrices['cePrices'][1]
     filteredData.rename(columns={'strikePrice': 'Strike Price'})
-    logging.debug(f'final filteredData: \n{filteredData}')
+    logging.debug('final filteredData: \n%s', filteredData)
     finalDf = existingDashboardDf.append(filteredData, ignore_index=True)
-    logging.debug(f'final dashboard df before returning: \n{finalDf}')
+    logging.debug('final dashboard df before returning: \n%s', finalDf)
     return finalDf
 
+@timed()
 def getSupportResistancePricesCePe(optsDf: pd.DataFrame) -> dict:
     '''
     Returns a dict containing support and resistance strike prices based on highest and second highest CE/PE volumes, takes the options chain dataframe as input.
     '''
     logging.debug('inside getSupportResistancePricesCePe')
-    logging.debug(f'dataframe to parse: \n{optsDf}\n{optsDf.info()}')
+    logging.debug('dataframe to parse: \n%s', optsDf)
     pePrices = optsDf.loc[optsDf['PE.totalTradedVolume'].isin(optsDf['PE.totalTradedVolume'].nlargest(2))]['strikePrice'].tolist()
     cePrices = optsDf.loc[optsDf['CE.totalTradedVolume'].isin(optsDf['CE.totalTradedVolume'].nlargest(2))]['strikePrice'].tolist()
     supprtResistancePrices = {'support1': pePrices[1], 'support2': pePrices[0],'resistance1': cePrices[0], 'resistance2': cePrices[1]}
     logging.debug(f'support and resistance prices fetched: {supprtResistancePrices}')
-    return supprtResistancePrices
\ No newline at end of file
+    return supprtResistancePrices
+
+def _topTwoVolumeStrikes(optsDf: pd.DataFrame, keys: list, volumeCol: str) -> pd.DataFrame:
+    '''
+    Returns the first and second strike, in chain order, of each group whose volume is one of the two highest volumes of the group, same as getSupportResistancePricesCePe does for a single chain.
+    '''
+    ordered = optsDf.sort_values(keys + [volumeCol], ascending=[True]*len(keys) + [False], kind='mergesort')
+    secondHighest = ordered[ordered.groupby(keys, sort=False).cumcount() == 1].set_index(keys)[volumeCol].rename('threshold')
+    threshold = optsDf[keys].join(secondHighest, on=keys)['threshold']
+    topRows = optsDf[optsDf[volumeCol] >= threshold]
+    position = topRows.groupby(keys, sort=False).cumcount()
+    first = topRows[position == 0].set_index(keys)['strikePrice']
+    second = topRows[position == 1].set_index(keys)['strikePrice']
+    return pd.DataFrame({'first': first, 'second': second})
+
+@timed()
+def getSupportResistancePricesBatch(optsDf: pd.DataFrame, keys: list = ['Symbol']) -> pd.DataFrame:
+    '''
+    Returns support and resistance strike prices for every chain in optsDf, option chains stacked with the keys columns, indexed by keys with the same columns as the dict of getSupportResistancePricesCePe. Prices are NaN for chains with less than two strikes.
+    '''
+    logging.debug('inside getSupportResistancePricesBatch')
+    optsDf = optsDf.reset_index(drop=True)
+    pePrices = _topTwoVolumeStrikes(optsDf, keys, 'PE.totalTradedVolume')
+    cePrices = _topTwoVolumeStrikes(optsDf, keys, 'CE.totalTradedVolume')
+    supportResistanceDf = pd.DataFrame({'support1': pePrices['second'], 'support2': pePrices['first'], 'resistance1': cePrices['first'], 'resistance2': cePrices['second']})
+    logging.debug('support and resistance prices fetched: \n%s', supportResistanceDf)
+    return supportResistanceDf
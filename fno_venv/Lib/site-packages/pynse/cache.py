@@ -0,0 +1,183 @@
+import gzip
+import logging
+import os
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# max_bytes and max_age (seconds, None to keep entries until they are evicted for space) of each category
+DEFAULT_CACHE_LIMITS = {
+    'bhavcopy_eq': {'max_bytes': 256 * 2 ** 20, 'max_age': None},
+    'bhavcopy_fno': {'max_bytes': 512 * 2 ** 20, 'max_age': None},
+    'pre_open': {'max_bytes': 64 * 2 ** 20, 'max_age': 30 * 86400},
+    'temp': {'max_bytes': 8 * 2 ** 20, 'max_age': None},
+}
+
+
+class CacheManager:
+    """
+    size bounded store of pickled objects under root, one directory per category.
+    entries are written as gzip compressed pickles, entries written by older versions as plain .pkl files are read and evicted like the others.
+    a category is listed once, when it is first used, and kept in an in-process index of key -> (file, size, written, last used),
+    so lookups and size checks do not walk the directory tree. When an entry is written, entries older than max_age
+    and then the least recently used ones are removed until the category fits max_bytes.
+
+    Examples
+    --------
+
+    >>> cache = CacheManager('~/.pynse/', {'pre_open': {'max_bytes': 2 ** 20, 'max_age': 86400}})
+    >>> cache.put('pre_open', '2020-06-17', df)
+    >>> cache.get('pre_open', '2020-06-17')
+
+    """
+
+    suffixes = ('.pkl.gz', '.pkl')
+
+    def __init__(self, root: str, limits: dict = None, compress_level: int = 6):
+        """
+        :param root: directory holding the category directories
+        :param limits: max_bytes/max_age of categories, overriding DEFAULT_CACHE_LIMITS
+        :param compress_level: gzip level, 1 is fastest
+        """
+        self.root = root
+        self.limits = {category: dict(limit) for category, limit in DEFAULT_CACHE_LIMITS.items()}
+        for category, limit in (limits or {}).items():
+            self.limits.setdefault(category, {'max_bytes': None, 'max_age': None}).update(limit)
+        self.compress_level = compress_level
+        self.__index = {}
+        self.__lock = threading.RLock()
+
+    def __entries(self, category):
+        """
+        index of category, listing its directory the first time
+        """
+        entries = self.__index.get(category)
+        if entries is None:
+            entries = {}
+            path = os.path.join(self.root, category)
+            os.makedirs(path, exist_ok=True)
+            with os.scandir(path) as files:
+                for f in files:
+                    key = self.__key(f.name)
+                    if key is None or not f.is_file():
+                        continue
+                    stat = f.stat()
+                    # a .pkl.gz written later wins over a plain .pkl of the same key,
+                    # recency is not persisted so entries start out ordered by write time
+                    if key not in entries or f.name.endswith('.gz'):
+                        entries[key] = [f.path, stat.st_size, stat.st_mtime, stat.st_mtime]
+            self.__index[category] = entries
+        return entries
+
+    def __key(self, name):
+        for suffix in self.suffixes:
+            if name.endswith(suffix):
+                return name[:-len(suffix)]
+        return None
+
+    def __expired(self, category, entry, now):
+        max_age = self.limits.get(category, {}).get('max_age')
+        return max_age is not None and now - entry[2] > max_age
+
+    def __remove(self, category, key):
+        path = self.__index[category].pop(key)[0]
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        logger.debug(f'evicted {path}')
+
+    def get(self, category: str, key: str):
+        """
+        returns the object stored under key, None if there is none or it is older than max_age
+        """
+        with self.__lock:
+            entries = self.__entries(category)
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if self.__expired(category, entry, time.time()):
+                self.__remove(category, key)
+                return None
+            entry[3] = time.time()
+            path = entry[0]
+        try:
+            with (gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')) as f:
+                obj = pickle.load(f)
+        except FileNotFoundError:
+            # evicted meanwhile or removed by someone else
+            with self.__lock:
+                if entries.get(key) is entry:
+                    entries.pop(key)
+            return None
+        logger.debug(f'read {path} from cache')
+        return obj
+
+    def put(self, category: str, key: str, obj):
+        """
+        stores obj under key, replacing an older entry, and evicts entries until category is within its limits
+        """
+        data = gzip.compress(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), self.compress_level)
+        with self.__lock:
+            entries = self.__entries(category)
+            path = os.path.join(self.root, category, f'{key}.pkl.gz')
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            old = entries.get(key)
+            if old is not None and old[0] != path:
+                self.__remove(category, key)
+            now = time.time()
+            entries[key] = [path, len(data), now, now]
+            logger.debug(f'saved {path}')
+            self.evict(category, keep=key)
+
+    def evict(self, category: str, keep: str = None):
+        """
+        removes the entries of category older than max_age, then the least recently used ones until it fits max_bytes
+        :param keep: key which is not evicted for space, like the entry just written
+        """
+        with self.__lock:
+            entries = self.__entries(category)
+            limit = self.limits.get(category, {})
+            now = time.time()
+            for key in [key for key, entry in entries.items() if key != keep and self.__expired(category, entry, now)]:
+                self.__remove(category, key)
+            max_bytes = limit.get('max_bytes')
+            if max_bytes is None:
+                return
+            size = sum(entry[1] for entry in entries.values())
+            for key in sorted(entries, key=lambda key: entries[key][3]):
+                if size <= max_bytes:
+                    break
+                if key != keep:
+                    size -= entries[key][1]
+                    self.__remove(category, key)
+
+    def size(self, category: str = None) -> int:
+        """
+        bytes stored in category, or in the categories used so far when category is None
+        """
+        with self.__lock:
+            categories = [category] if category is not None else list(self.__index)
+            return sum(entry[1] for c in categories for entry in self.__entries(c).values())
+
+    def keys(self, category: str) -> list:
+        """
+        keys of category, least recently used first
+        """
+        with self.__lock:
+            entries = self.__entries(category)
+            return sorted(entries, key=lambda key: entries[key][3])
+
+    def clear(self, category: str = None):
+        """
+        removes every entry of category, of the categories used so far when category is None
+        """
+        with self.__lock:
+            for c in ([category] if category is not None else list(self.__index)):
+                for key in list(self.__entries(c)):
+                    self.__remove(c, key)
@@ -4,17 +4,25 @@ import io
 import logging
 import os
 import pickle
+import random
 import shutil
+import threading
 import time
 import urllib.parse
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import requests
+import requests.adapters
 from bs4 import BeautifulSoup
-from glob import glob
+from .cache import CacheManager
+from .store import BhavcopyStore
 logger = logging.getLogger(__name__)
 
+# requests per second sent to nse when no rate_limit or PYNSE_RATE_LIMIT is given
+DEFAULT_RATE_LIMIT = 3
+
 
 class IndexSymbol(enum.Enum):
     All = 'ALL'
@@ -57,6 +65,10 @@ class IndexSymbol(enum.Enum):
     NiftyServSector = 'NIFTY SERV SECTOR'
 
 
+# members of IndexSymbol, a str is not a member and checking it against the enum itself raises TypeError
+INDEX_SYMBOLS = frozenset(IndexSymbol)
+
+
 class Format(enum.Enum):
     pkl = 'pkl'
     csv = 'csv'
@@ -73,6 +85,141 @@ class OptionType(enum.Enum):
     PE = 'Put'
 
 
+# sides and fields of the option chain api in the order nse sends them
+OPTION_CHAIN_SIDES = ('PE', 'CE')
+OPTION_CHAIN_FIELDS = ('strikePrice', 'expiryDate', 'underlying', 'identifier', 'openInterest', 'changeinOpenInterest',
+                       'pchangeinOpenInterest', 'totalTradedVolume', 'impliedVolatility', 'lastPrice', 'change', 'pChange',
+                       'totalBuyQuantity', 'totalSellQuantity', 'bidQty', 'bidprice', 'askQty', 'askPrice', 'underlyingValue')
+
+
+def parse_option_chain(records: list, expiry, fields: list = None) -> pd.DataFrame:
+    """
+    builds the option chain of one or more expiries from the records of nse option chain api
+
+    records of other expiries are dropped before flattening, expiry dates are parsed once per unique value
+    and only the CE/PE fields given are read, all fields if None. the columns are always PE then CE in the order
+    of fields, OPTION_CHAIN_FIELDS when None, a strike without a PE or CE leg has NaN in the columns of that side
+
+    :param expiry: dt.date or a list of dt.date
+    :returns pd.DataFrame with strikePrice, expiryDate and one column per side and field like CE.openInterest
+    """
+    expiries = set(expiry) if isinstance(expiry, (list, tuple, set, frozenset)) else {expiry}
+    expiry_dates = {d: dt.datetime.strptime(d, '%d-%b-%Y').date()
+                    for d in {r['expiryDate'] for r in records}}
+    records = [r for r in records if expiry_dates[r['expiryDate']] in expiries]
+
+    if fields is None:
+        # fields nse added since come last
+        fields = list(dict.fromkeys([*OPTION_CHAIN_FIELDS, *(f for r in records for side in OPTION_CHAIN_SIDES
+                                                              if side in r for f in r[side])]))
+
+    columns = {'strikePrice': [r['strikePrice'] for r in records],
+               'expiryDate': [expiry_dates[r['expiryDate']] for r in records]}
+    for side in OPTION_CHAIN_SIDES:
+        side_records = [r.get(side, {}) for r in records]
+        for field in fields:
+            columns[f'{side}.{field}'] = [r.get(field, np.nan) for r in side_records]
+
+    return pd.DataFrame(columns)
+
+
+def parse_quotes(data: list) -> pd.DataFrame:
+    """
+    builds the quotes of the data of nse stock indices api
+
+    :returns pd.DataFrame with open, lastPrice, high, low, previousClose and pChange indexed by symbol
+    """
+    quotes = pd.DataFrame({
+        'symbol': [i['symbol'] for i in data],
+        'open': [i['open'] for i in data],
+        'lastPrice': [i['lastPrice'] for i in data],
+        'high': [i['dayHigh'] for i in data],
+        'low': [i['dayLow'] for i in data],
+        'previousClose': [i.get('previousClose') for i in data],
+        'pChange': [i.get('pChange') for i in data],
+    })
+    return quotes.drop_duplicates('symbol').set_index('symbol')
+
+
+class RateLimiter:
+    """
+    token bucket shared by every thread of an Nse instance, allowing rate requests per second with bursts of up to burst requests.
+    the rate adapts to throttling: backoff() halves it and every success gives back a share of it until the configured rate is reached again.
+    without a limit, backoff() starts limiting at half of backoff_rate and the limit is lifted again once backoff_rate is recovered
+    """
+
+    def __init__(self, rate: float = 0, burst: float = None, min_rate: float = 0.2, backoff_rate: float = DEFAULT_RATE_LIMIT):
+        """
+        :param rate: requests per second, 0 for no limit
+        :param burst: requests allowed at once, defaults to one second worth of requests
+        :param min_rate: backoff() never lowers the rate below this
+        :param backoff_rate: rate backoff() halves when there is no limit
+        """
+        self.__lock = threading.Lock()
+        self.min_rate = min_rate
+        self.backoff_rate = backoff_rate
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: float, burst: float = None):
+        with self.__lock:
+            self.rate = float(rate)
+            self.current_rate = self.rate
+            self.burst = float(burst) if burst else max(1., self.rate)
+            self.__tokens = self.burst
+            self.__updated_at = time.monotonic()
+
+    def acquire(self):
+        """
+        blocks until a request may be sent
+        """
+        while True:
+            with self.__lock:
+                if not self.current_rate:
+                    return
+                now = time.monotonic()
+                self.__tokens = min(self.burst, self.__tokens + (now - self.__updated_at) * self.current_rate)
+                self.__updated_at = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = (1 - self.__tokens) / self.current_rate
+            time.sleep(wait)
+
+    def backoff(self):
+        with self.__lock:
+            self.current_rate = max(self.min_rate, (self.current_rate or self.backoff_rate) / 2)
+
+    def recover(self):
+        with self.__lock:
+            if not self.current_rate:
+                return
+            ceiling = self.rate or self.backoff_rate
+            self.current_rate = min(ceiling, self.current_rate + ceiling / 20)
+            if not self.rate and self.current_rate >= ceiling:
+                self.current_rate = 0.
+
+
+class SymbolLists(dict):
+    """
+    symbol lists of the IndexSymbols by name, each read as a frozenset the first time it is used
+    """
+
+    def __init__(self, loader):
+        """
+        :param loader: returns the symbols of an IndexSymbol name
+        """
+        super().__init__()
+        self.__loader = loader
+        self.__lock = threading.Lock()
+
+    def __missing__(self, name):
+        with self.__lock:
+            if not dict.__contains__(self, name):
+                self[name] = frozenset(self.__loader(name))
+                logger.debug(f'read symbol list for {name}')
+            return dict.__getitem__(self, name)
+
+
 class Nse:
     """
     pynse is a library to extract realtime and historical data from NSE website
@@ -109,12 +256,47 @@ class Nse:
                 f.write(obj)
         logger.debug(f'saved {filename}')
 
-    def __init__(self):
+    __headers = {'Accept': '*/*',
+                 'Connection': 'keep-alive',
+                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/72.0.3626 Safari/537.36',
+                 'Accept-Encoding': 'gzip, deflate, br',
+                 'Accept-Language': 'en-US;q=0.5,en;q=0.3',
+                 'DNT': '1'}
+
+    __index_values = frozenset(idx.value for idx in IndexSymbol)
+
+    def __init__(self, persist_session: bool = False, pool_size: int = 20, host: str = None, rate_limit: float = None,
+                 cache_limits: dict = None):
+        """
+        :param persist_session: pickle the http session to the temp dir so it survives restarts
+        :param pool_size: max keep-alive connections kept open to nse
+        :param host: scheme and host the api paths are requested from, like http://127.0.0.1:8765,
+            defaults to the PYNSE_HOST environment variable and then to the configured nse host
+        :param rate_limit: requests per second sent to nse by all threads together, defaults to the PYNSE_RATE_LIMIT environment variable
+            and then to DEFAULT_RATE_LIMIT, 0 for no limit
+        :param cache_limits: max_bytes/max_age of the cached bhavcopy_eq, bhavcopy_fno, pre_open and temp (session) data,
+            like {'pre_open': {'max_bytes': 2 ** 20, 'max_age': 86400}}, see pynse.cache.DEFAULT_CACHE_LIMITS
+        """
 
         self.expiry_list = []
         self.strike_list = []
         self.max_retries = 5
         self.timeout = 10
+        # retry n waits a random time up to backoff_base * 2 ** n seconds, capped at backoff_max
+        self.backoff_base = 0.5
+        self.backoff_max = 30
+        self.rate_limiter = RateLimiter(
+            rate_limit if rate_limit is not None else float(os.environ.get('PYNSE_RATE_LIMIT', DEFAULT_RATE_LIMIT)))
+        self.persist_session = persist_session
+        self.pool_size = pool_size
+        # seconds a session is reused when nse sets no cookie expiry
+        self.session_ttl = 300
+        # time of day after which the bhavcopy of the day is published
+        self.bhavcopy_publish_time = dt.time(18, 45)
+
+        self.__session = None
+        self.__expires_at = 0.
+        self.__session_lock = threading.Lock()
 
         self.__urls = dict()
         # home directory for user
@@ -126,7 +308,7 @@ class Nse:
 
         # update dirs
         self.dir.update({d: f'{self.dir["data_root"]}{d}/' for d in
-                         ['bhavcopy_eq', 'bhavcopy_fno', 'option_chain', 'symbol_list', 'pre_open', 'hist',
+                         ['bhavcopy_eq', 'bhavcopy_fno', 'bhavcopy_fno_store', 'option_chain', 'symbol_list', 'pre_open', 'hist',
                           'fii_dii', 'temp']})
 
         # symbol file names for IndexSymbols
@@ -139,54 +321,116 @@ class Nse:
 
         # create dir and copy symbol files
         self.__startup()
-
-        # store symbol list for indexes here
-        self.symbols = {i.name: self.__read_object(
-            self.__symbol_files[i.name], Format.pkl) for i in IndexSymbol}
-
-        logger.info(
-            f'pyNse cache size: {self.__data_size()}.\nYou may want to run `nse.clear_data()` if running low on disk space.')
-
-    def __temp(self, new=False):
-        temp_file = f"{self.dir['temp']}temp"
-        if new or not os.path.exists(temp_file):
-            session = requests.Session()
-            session.get('https://www.nseindia.com', headers={'Accept': '*/*',
-                                                             'Connection': 'keep-alive',
-                                                             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/72.0.3626 Safari/537.36',
-                                                             'Accept-Encoding': 'gzip, deflate, br',
-                                                             'Accept-Language': 'en-US;q=0.5,en;q=0.3',
-                                                             'DNT': '1'})
-            with open(temp_file, 'wb')as f:
-                pickle.dump(session, f)
-        else:
-            with open(temp_file, 'rb')as f:
-                session = pickle.load(f)
+        self.cache = CacheManager(self.dir['data_root'], cache_limits)
+        self.bhavcopy_fno_store = BhavcopyStore(self.dir['bhavcopy_fno_store'])
+        self.__urls['host'] = (host or os.environ.get('PYNSE_HOST') or self.__urls['host']).rstrip('/')
+
+        # store symbol list for indexes here, read on first use
+        self.symbols = SymbolLists(
+            lambda name: self.__read_object(self.__symbol_files[name], Format.pkl))
+
+    def __new_session(self):
+        session = requests.Session()
+        # keep-alive pool shared by every thread using this instance
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self.__headers)
+        # homepage visit sets the cookies required by the api
+        self.rate_limiter.acquire()
+        session.get(self.__urls['host'], timeout=self.timeout).raise_for_status()
+        logger.debug('created new session')
         return session
 
+    def __session_expiry(self, session):
+        # refresh with the first cookie that expires
+        expiries = [c.expires for c in session.cookies if c.expires]
+        return min(expiries) if expiries else time.time() + self.session_ttl
+
+    def __temp(self, stale=None):
+        """
+        returns the shared session, creating it if it is missing or its cookies have expired
+        :param stale: session which got rejected by nse, replaced unless another thread already did
+        :return: requests.Session
+        """
+        with self.__session_lock:
+            session = self.__session
+            if session is None and stale is None and self.persist_session:
+                session = self.cache.get('temp', 'temp')
+                if session is not None:
+                    logger.debug('read session from cache')
+                    self.__expires_at = self.__session_expiry(session)
+
+            if session is None or session is stale or time.time() >= self.__expires_at:
+                session = self.__new_session()
+                self.__expires_at = self.__session_expiry(session)
+                if self.persist_session:
+                    self.cache.put('temp', 'temp', session)
+
+            self.__session = session
+            return session
+
+    def __backoff_delay(self, attempt, response=None):
+        """
+        seconds to wait before retry attempt, at least the Retry-After of a throttled response
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(self.backoff_max, float(retry_after)))
+        return delay
+
     def __get_resp(self, url, timeout=0):
-        headers = {'Accept': '*/*',
-                   'Connection': 'keep-alive',
-                   'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/72.0.3626 Safari/537.36',
-                   'Accept-Encoding': 'gzip, deflate, br',
-                   'Accept-Language': 'en-US;q=0.5,en;q=0.3',
-                   'DNT': '1',
-                   'referer':'https://www.nseindia.com'}
+        """
+        gets url through the rate limiter, retrying timeouts, connection errors, 429 and 5xx responses up to max_retries times,
+        of the homepage handshake as well
+        :raises requests.HTTPError: the last response still failed
+        :raises requests.RequestException: the last attempt timed out or could not connect
+        """
+        headers = {'referer': 'https://www.nseindia.com'}
         # use global timeout if not specified
         timeout = self.timeout if timeout == 0 else timeout
 
-        session = self.__temp(new=True)
-
-        try:
-            response = session.get(url, headers=headers, timeout=timeout)
-
-        except Exception as e:
-            logger.error(e)
-
-        else:
-            with open(f"{self.dir['temp']}session", 'wb')as f:
-                pickle.dump(session, f)
-            return response
+        stale = None
+        attempt = 0
+        while True:
+            response = None
+            try:
+                session = self.__temp(stale=stale)
+                self.rate_limiter.acquire()
+                response = session.get(url, headers=headers, timeout=timeout)
+                # cookies rejected, handshake again and retry once
+                if response.status_code in (401, 403) and stale is None:
+                    logger.debug(f'got {response.status_code} for {url}, refreshing session')
+                    stale = session
+                    continue
+                if response.status_code != 429 and response.status_code < 500:
+                    self.rate_limiter.recover()
+                    response.raise_for_status()
+                    return response
+                if response.status_code == 429:
+                    self.rate_limiter.backoff()
+                if attempt >= self.max_retries:
+                    response.raise_for_status()
+            except requests.HTTPError as e:
+                # response is None when the handshake failed, retried when throttled or 5xx like the api response
+                status = e.response.status_code if e.response is not None else 0
+                if response is not None or attempt >= self.max_retries or (status != 429 and status < 500):
+                    raise
+                if status == 429:
+                    self.rate_limiter.backoff()
+                response = e.response
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug(f'{e} for {url}')
+
+            delay = self.__backoff_delay(attempt, response)
+            attempt += 1
+            logger.debug(f'retry {attempt}/{self.max_retries} of {url} in {delay:.2f}s'
+                         f'{f" after {response.status_code}" if response is not None else ""}')
+            time.sleep(delay)
 
     def __startup(self):
         """
@@ -199,8 +443,13 @@ class Nse:
         # create folder if doesn't exists
         for _, path in self.dir.items():
             if path != '':
-                if not os.path.exists(path):
-                    os.mkdir(path)
+                os.makedirs(path, exist_ok=True)
+
+        # the session pickled without a suffix by older versions, the cache neither reads nor evicts it
+        legacy_session = f"{self.dir['temp']}temp"
+        if os.path.isfile(legacy_session):
+            os.remove(legacy_session)
+            logger.debug(f'removed {legacy_session}')
 
         # check if first run
         if not os.path.exists(self.__symbol_files['All']):
@@ -221,10 +470,11 @@ class Nse:
                         logger.error(e)
 
     @staticmethod
-    def __validate_symbol(symbol, _list):
+    def __validate_symbol(symbol, *collections):
         '''
         parse symbol, replaces spaces and special characters to amke url compatible
         :param symbol:
+        :param collections: valid symbols, sets are checked without a scan
         :return: symbol in url format symbol
         '''
 
@@ -234,7 +484,7 @@ class Nse:
 
             return symbol
 
-        elif symbol in _list:
+        elif any(symbol in _list for _list in collections):
             symbol = urllib.parse.quote(symbol.upper())
 
             return symbol
@@ -243,6 +493,22 @@ class Nse:
             symbol = None
             raise ValueError('not a vaild symbol')
 
+    def get_json(self, path: str, **params) -> dict:
+        """
+        returns the raw json of a configured nse api path, the path is formatted with params
+
+        Examples
+        --------
+
+        >>> nse.get_json('option_cahin_equities', symbol='INFY')
+
+        >>> nse.get_json('symbol_list', index='SECURITIES%20IN%20F%26O')
+
+        """
+        config = self.__urls
+        logger.info(f"downloading {path} {params}")
+        return self.__get_resp(config['host'] + config['path'][path].format(**params)).json()
+
     def market_status(self) -> dict:
         """
         get market status
@@ -311,7 +577,7 @@ class Nse:
             quote = {}
             if segment == 'EQ':
                 symbol = self.__validate_symbol(symbol,
-                                                self.symbols[IndexSymbol.All.name] + [idx.value for idx in IndexSymbol])
+                                                self.symbols[IndexSymbol.All.name], self.__index_values)
 
                 url = config['host'] + \
                     config['path']['quote_eq'].format(symbol=symbol)
@@ -332,7 +598,7 @@ class Nse:
 
             elif segment == 'FUT':
                 symbol = self.__validate_symbol(symbol,
-                                                self.symbols[IndexSymbol.FnO.name] + ['NIFTY', 'BANKNIFTY'])
+                                                self.symbols[IndexSymbol.FnO.name], ('NIFTY', 'BANKNIFTY'))
 
                 url = config['host'] + \
                     config['path']['quote_derivative'].format(symbol=symbol)
@@ -416,6 +682,32 @@ class Nse:
 
             return quote
 
+    def get_quotes(self, index: IndexSymbol = IndexSymbol.FnO) -> pd.DataFrame:
+        """
+
+        Get realtime EQ quotes for every constituent of an index in a single request
+
+        returns open, lastPrice, high and low indexed by symbol
+
+        Examples
+        --------
+
+        >>> nse.get_quotes()
+
+        >>> nse.get_quotes(IndexSymbol.Nifty50)
+
+        """
+        index = self.__validate_symbol(
+            index.value, self.__index_values - {'ALL'})
+        index = 'SECURITIES%20IN%20F%26O' if index == 'FNO' else index
+        config = self.__urls
+        logger.info(f"downloading quotes for {index}")
+        url = config['host'] + \
+            config['path']['symbol_list'].format(index=index)
+        data = self.__get_resp(url).json()['data']
+
+        return parse_quotes(data)
+
     def bhavcopy(self, req_date: dt.date = None,
                  series: str = 'eq') -> pd.DataFrame:
         """
@@ -436,18 +728,13 @@ class Nse:
         req_date = self.trading_days(
         )[-1].date() if req_date is None else req_date
 
-        filename = f'{self.dir["bhavcopy_eq"]}bhav_{req_date}.pkl'
+        key = f'bhav_{req_date}'
 
-        bhavcopy = None
-        # if file is present, ie downloaded previously
-        # read file
-        if os.path.exists(filename):
-            bhavcopy = pd.read_pickle(filename)
-            logger.debug(f'read {filename} from disk')
+        # read if downloaded previously
+        bhavcopy = self.cache.get('bhavcopy_eq', key)
 
-        # if file is not present
-        # download the file
-        else:
+        # otherwise download the file
+        if bhavcopy is None:
             config = self.__urls
             url = config['path']['bhavcopy'].format(
                 date=req_date.strftime("%d%m%Y"))
@@ -458,7 +745,7 @@ class Nse:
                 lambda x: dt.datetime.strptime(x, '%d-%b-%Y').date())
 
             # save the downloaded bhavcopy
-            bhavcopy.to_pickle(filename)
+            self.cache.put('bhavcopy_eq', key, bhavcopy)
 
         if bhavcopy is not None:
             # filter as as required
@@ -488,38 +775,103 @@ class Nse:
         req_date = self.trading_days(
         )[-1].date() if req_date is None else req_date
 
-        filename = f'{self.dir["bhavcopy_fno"]}bhav_{req_date}.pkl'
+        key = f'bhav_{req_date}'
 
-        bhavcopy = None
-        if os.path.exists(filename):
-            bhavcopy = pd.read_pickle(filename)
-            logger.debug(f'read {filename} from disk')
+        bhavcopy = self.cache.get('bhavcopy_fno', key)
+        if bhavcopy is None:
+            bhavcopy = self.__download_bhavcopy_fno(req_date).set_index('SYMBOL')
 
-        else:
-            config = self.__urls
-            url = config['path']['bhavcopy_derivatives'].format(date=req_date.strftime("%d%b%Y").upper(),
-                                                                month=req_date.strftime(
-                                                                    "%b").upper(),
-                                                                year=req_date.strftime("%Y"))
+            self.cache.put('bhavcopy_fno', key, bhavcopy)
 
-            logger.debug("downloading bhavcopy for {}".format(req_date))
-            stream = self.__get_resp(
-                url).content
+        return bhavcopy
 
-            filebytes = io.BytesIO(stream)
-            zf = zipfile.ZipFile(filebytes)
+    def __download_bhavcopy_fno(self, req_date):
+        """
+        downloads the F&O bhavcopy of req_date, with SYMBOL as a column
+        :raises requests.HTTPError: no bhavcopy for req_date, like on holidays
+        """
+        config = self.__urls
+        url = config['path']['bhavcopy_derivatives'].format(date=req_date.strftime("%d%b%Y").upper(),
+                                                            month=req_date.strftime(
+                                                                "%b").upper(),
+                                                            year=req_date.strftime("%Y"))
 
-            bhavcopy = pd.read_csv(zf.open(zf.namelist()[0]))
+        logger.debug("downloading bhavcopy for {}".format(req_date))
+        stream = self.__get_resp(
+            url).content
 
-            bhavcopy.set_index('SYMBOL', inplace=True)
-            bhavcopy.dropna(axis=1, inplace=True)
-            bhavcopy.EXPIRY_DT = bhavcopy.EXPIRY_DT.apply(
-                lambda x: dt.datetime.strptime(x, '%d-%b-%Y'))
+        filebytes = io.BytesIO(stream)
+        zf = zipfile.ZipFile(filebytes)
 
-            bhavcopy.to_pickle(filename)
+        bhavcopy = pd.read_csv(zf.open(zf.namelist()[0]))
 
+        bhavcopy.dropna(axis=1, inplace=True)
+        bhavcopy['EXPIRY_DT'] = pd.to_datetime(bhavcopy['EXPIRY_DT'], format='%d-%b-%Y')
         return bhavcopy
 
+    def __backfill_bhavcopy_fno(self, req_date):
+        # a day read by bhavcopy_fno is cached already
+        cached = self.cache.get('bhavcopy_fno', f'bhav_{req_date}')
+        if cached is not None:
+            logger.debug(f'storing cached bhavcopy_fno of {req_date}')
+            self.bhavcopy_fno_store.write(req_date, cached.reset_index())
+            return
+        try:
+            bhavcopy = self.__download_bhavcopy_fno(req_date)
+        except requests.HTTPError as e:
+            # past days without a bhavcopy are holidays, today's may not be published yet
+            if e.response is not None and e.response.status_code == 404:
+                if req_date < dt.date.today():
+                    logger.debug(f'no bhavcopy_fno for {req_date}')
+                    self.bhavcopy_fno_store.write(req_date, None)
+                else:
+                    logger.debug(f'bhavcopy_fno of {req_date} is not published yet')
+                return
+            raise
+        self.bhavcopy_fno_store.write(req_date, bhavcopy)
+
+    def bhavcopy_fno_range(self, start: dt.date, end: dt.date = None, symbols: list = None, expiry: list = None,
+                           instruments: list = None, columns: list = None, max_workers: int = 8) -> pd.DataFrame:
+        """
+        F&O bhavcopies of the weekdays from start to end as one frame indexed by SYMBOL. end defaults to, and is capped at,
+        the last day whose bhavcopy is published: today after bhavcopy_publish_time, yesterday before.
+        days missing in the columnar store are taken from the bhavcopy_fno cache or downloaded in parallel, at the pace of the
+        rate limiter, and stored first.
+        the filters are applied while reading the store, so only the matching rows are loaded
+        :param symbols: only these symbols
+        :param expiry: only these expiry dates
+        :param instruments: only these instruments, like FUTSTK or OPTIDX
+        :param columns: columns returned besides SYMBOL, all when None
+        :param max_workers: days downloaded at once
+        :raises RuntimeError: some days could not be downloaded, the other days are stored so a retry only downloads those
+
+        Examples
+        --------
+
+        >>> nse.bhavcopy_fno_range(dt.date(2020,6,1), dt.date(2020,6,30))
+
+        >>> nse.bhavcopy_fno_range(dt.date(2020,6,1), symbols=['INFY', 'TCS'], instruments=['OPTSTK'], expiry=[dt.date(2020,6,25)])
+
+        """
+        now = dt.datetime.now()
+        published = now.date() if now.time() >= self.bhavcopy_publish_time else now.date() - dt.timedelta(days=1)
+        end = published if end is None else min(end, published)
+        stored = self.bhavcopy_fno_store.days()
+        missing = [day for day in pd.bdate_range(start, end).date if day not in stored]
+        if missing:
+            logger.info(f'downloading bhavcopy_fno of {len(missing)} days')
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bhavcopy') as executor:
+                futures = {executor.submit(self.__backfill_bhavcopy_fno, day): day for day in missing}
+            failed = {day: future.exception() for future, day in futures.items() if future.exception() is not None}
+            if failed:
+                for day, e in failed.items():
+                    logger.error(f'could not download bhavcopy_fno of {day}: {e}')
+                raise RuntimeError(f'could not download bhavcopy_fno of {", ".join(map(str, sorted(failed)))}') \
+                    from next(iter(failed.values()))
+
+        columns = None if columns is None else ['SYMBOL'] + [col for col in columns if col != 'SYMBOL']
+        return self.bhavcopy_fno_store.read(start, end, symbols, expiry, instruments, columns).set_index('SYMBOL')
+
     def pre_open(self) -> pd.DataFrame:
         """
 
@@ -532,15 +884,11 @@ class Nse:
 
         """
 
-        # check if todays file exists
-        filename = f"{self.dir['pre_open']}{dt.date.today()}.pkl"
-        if os.path.exists(filename):
-            # read if exists
-            pre_open_data = pd.read_pickle(filename)
-            logger.debug('pre_open data read from file')
+        # read todays data if cached
+        pre_open_data = self.cache.get('pre_open', str(dt.date.today()))
 
         # otherwise download
-        else:
+        if pre_open_data is None:
             logger.debug("downloading preopen data")
             config = self.__urls
             url = config['host'] + config['path']['preOpen']
@@ -557,15 +905,17 @@ class Nse:
                 "detail.preOpenMarket.lastUpdateTime"].apply(
                 lambda x: dt.datetime.strptime(x, '%d-%b-%Y %H:%M:%S'))
 
-            filename = f"{self.dir['pre_open']}{timestamp}.pkl"
-            pre_open_data.to_pickle(filename)
+            self.cache.put('pre_open', str(timestamp), pre_open_data)
 
         return pre_open_data
 
-    def option_chain(self, symbol: str, expiry: dt.date = None) -> pd.DataFrame:
+    def option_chain(self, symbol: str, expiry=None, fields: list = None) -> pd.DataFrame:
         """
         downloads the latest available option chain from nse website
         if no expiry is None current contract option chain 
+        expiry can be a list of dates to get several expiries from a single download
+
+        :param fields: CE/PE fields to keep, like ['openInterest', 'lastPrice'], all fields if None
 
         :returns dictonaly containing
             timestamp as str
@@ -579,10 +929,14 @@ class Nse:
 
         >>> nse.option_chain('INFY',expiry=dt.date(2020,6,30))
 
+        >>> nse.option_chain('INFY',fields=['openInterest', 'lastPrice'])
+
+        >>> nse.option_chain('INFY',expiry=[dt.date(2020,6,25),dt.date(2020,7,30)])
+
         """
 
         symbol = self.__validate_symbol(
-            symbol, self.symbols[IndexSymbol.FnO.name] + ['NIFTY', 'BANKNIFTY', 'NIFTYIT'])
+            symbol, self.symbols[IndexSymbol.FnO.name], ('NIFTY', 'BANKNIFTY', 'NIFTYIT'))
         logger.debug(f'download option chain')
         config = self.__urls
 
@@ -593,11 +947,8 @@ class Nse:
         self.expiry_list = sorted([dt.datetime.strptime(
             d, '%d-%b-%Y').date() for d in data['records']['expiryDates']])
         expiry = expiry or self.expiry_list[0]
-        option_chain = pd.json_normalize(data['records']['data'])
-        option_chain.expiryDate = option_chain.expiryDate.apply(
-            lambda x: dt.datetime.strptime(x, '%d-%b-%Y').date())
+        option_chain = parse_option_chain(data['records']['data'], expiry, fields)
 
-        option_chain = option_chain[option_chain.expiryDate == expiry]
         self.strike_list = sorted(list(option_chain.strikePrice))
 
         return option_chain
@@ -708,7 +1059,6 @@ class Nse:
             hist = pd.concat([hist, pd.read_csv(io.StringIO(csv))[::-1]])
             if is_complete:
                 break
-            time.sleep(1)
 
         hist['Date'] = pd.to_datetime(hist['Date'])
         hist.set_index('Date', inplace=True)
@@ -718,7 +1068,6 @@ class Nse:
             hist.columns = ['open', 'high', 'low', 'close', 'volume']
         except Exception as e:
             print(hist.columns, e)
-            time.sleep(5)
 
         for column in hist.columns[:4]:
             hist[column] = hist[column].astype(str).str.replace(
@@ -772,7 +1121,6 @@ class Nse:
                     if len(_row) > 4:
                         hist.loc[len(hist)] = _row
 
-            time.sleep(1)
         hist.Date = hist.Date.apply(
             lambda d: dt.datetime.strptime(d, '%d-%b-%Y'))
 
@@ -799,7 +1147,7 @@ class Nse:
 
         """
         symbol = self.__validate_symbol(symbol,
-                                        self.symbols[IndexSymbol.All.name] + [idx.value for idx in IndexSymbol])
+                                        self.symbols[IndexSymbol.All.name], self.__index_values)
 
         if "NIFTY" in symbol:
             return self.__get_hist_index(symbol, from_date, to_date)
@@ -819,7 +1167,7 @@ class Nse:
         """
         # need validation only so not assigned
         if index is not None:
-            self.__validate_symbol(index, [idx for idx in IndexSymbol])
+            self.__validate_symbol(index, INDEX_SYMBOLS)
         config = self.__urls
         url = config['host'] + config['path']['indices']
         data = self.__get_resp(url).json()['data']
@@ -834,7 +1182,7 @@ class Nse:
 
     def __gainers_losers(self, index, advance=False):
         index = self.__validate_symbol(
-            index.value, [idx.value for idx in IndexSymbol if idx.value != 'ALL'])
+            index.value, self.__index_values - {'ALL'})
         index = 'SECURITIES%20IN%20F%26O' if index == 'FNO' else index
         config = self.__urls
         url = config['host'] + \
@@ -883,7 +1231,7 @@ class Nse:
         else:
 
             url = config['host'] + config['path']['symbol_list'].format(
-                index=self.__validate_symbol(index, IndexSymbol))
+                index=self.__validate_symbol(index, INDEX_SYMBOLS))
             data = self.__get_resp(url).json()['data']
 
             data = [i['meta']['symbol']
@@ -893,6 +1241,8 @@ class Nse:
         with open(self.dir['symbol_list'] + index.name + '.pkl', 'wb')as f:
             pickle.dump(data, f)
             logger.info(f'symbol list saved for {index}')
+        # read again on next use
+        self.symbols.pop(index.name, None)
         return data
 
     def update_symbol_list(self):
@@ -911,7 +1261,6 @@ class Nse:
         """
         for i in [a for a in IndexSymbol]:
             self.__symbol_list(i)
-            time.sleep(1)
 
     def trading_days(self):
         # todo make this private
@@ -990,22 +1339,18 @@ class Nse:
 
         return losers
 
-    def __list_all_files(self):
-        root = self.dir['data_root']
-        files = glob(f'{root}/*')
-        files.extend(glob(f'{root}/*'))
-        files.extend(glob(f'{root}/*/*'))
-        files.extend(glob(f'{root}/*/*/*'))
-
-        return files
+    def data_size(self):
+        """size of home folder .pynse, computed when called
+        Examples
+        --------
 
-    def __data_size(self):
-        """size of home folder .pynse
+        >>> nse.data_size()
+        (12.5, 'MB')
         """
 
-        files = self.__list_all_files()
-        size_bytes = sum(os.path.getsize(f)
-                         for f in files if os.path.isfile(f))
+        size_bytes = 0
+        for root, _, files in os.walk(self.dir['data_root']):
+            size_bytes += sum(os.path.getsize(os.path.join(root, f)) for f in files)
 
         y = 1
         for unit in ['B', 'KB', 'MB', 'GB']:
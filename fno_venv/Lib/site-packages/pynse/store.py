@@ -0,0 +1,145 @@
+import datetime as dt
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class BhavcopyStore:
+    """
+    columnar store of daily F&O bhavcopies, one directory per day (date=YYYY-MM-DD) with one .npy file per column.
+    INSTRUMENT, SYMBOL and OPTION_TYP are stored as categorical codes next to their categories, EXPIRY_DT and TIMESTAMP
+    as datetime64[D] and integer columns as the smallest integer type holding them.
+    read() filters on the categorical and expiry columns first and loads the other columns memory-mapped, only for the matching rows.
+    a day without a bhavcopy (a holiday) is stored with no columns, so it is not downloaded again.
+
+    Examples
+    --------
+
+    >>> store = BhavcopyStore('~/.pynse/bhavcopy_fno_store/')
+    >>> store.write(dt.date(2020, 6, 17), bhavcopy)
+    >>> store.read(dt.date(2020, 6, 1), dt.date(2020, 6, 30), symbols=['INFY'], instruments=['OPTSTK'])
+
+    """
+
+    categoricals = ('INSTRUMENT', 'SYMBOL', 'OPTION_TYP')
+    dates = ('EXPIRY_DT', 'TIMESTAMP')
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.__days = None
+        self.__lock = threading.Lock()
+
+    def __partition(self, date):
+        return os.path.join(self.directory, f'date={date:%Y-%m-%d}')
+
+    def days(self) -> set:
+        """
+        dates stored, the directory is listed on first use only
+        """
+        with self.__lock:
+            if self.__days is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.__days = {dt.datetime.strptime(name[len('date='):], '%Y-%m-%d').date()
+                               for name in os.listdir(self.directory) if name.startswith('date=')}
+            return self.__days
+
+    def write(self, date: dt.date, bhavcopy: pd.DataFrame):
+        """
+        stores the bhavcopy of date, with SYMBOL as a column, replacing the stored one. None stores date as a day without bhavcopy
+        """
+        columns, stored = {}, []
+        if bhavcopy is not None:
+            for col in bhavcopy.columns:
+                values = bhavcopy[col]
+                stored.append(col)
+                if col in self.categoricals:
+                    values = pd.Categorical(values.astype(str))
+                    columns[f'{col}.codes'] = values.codes
+                    columns[f'{col}.categories'] = values.categories.to_numpy(dtype=str)
+                elif col in self.dates:
+                    columns[col] = pd.to_datetime(values, format='%d-%b-%Y').to_numpy(dtype='datetime64[D]')
+                elif pd.api.types.is_integer_dtype(values):
+                    columns[col] = pd.to_numeric(values, downcast='integer').to_numpy()
+                elif pd.api.types.is_numeric_dtype(values):
+                    columns[col] = values.to_numpy()
+                else:
+                    stored.pop()
+        partition = self.__partition(date)
+        tmp_dir = tempfile.mkdtemp(prefix='.~', dir=self.directory)
+        try:
+            np.save(os.path.join(tmp_dir, '_columns.npy'), np.array(stored, dtype=str))
+            for name, values in columns.items():
+                np.save(os.path.join(tmp_dir, f'{name}.npy'), values)
+            shutil.rmtree(partition, ignore_errors=True)
+            os.replace(tmp_dir, partition)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self.days().add(date)
+        logger.debug(f'stored bhavcopy_fno of {date}')
+
+    def read(self, start: dt.date, end: dt.date, symbols: list = None, expiry: list = None,
+             instruments: list = None, columns: list = None) -> pd.DataFrame:
+        """
+        returns the stored rows of the days from start to end, both included, as one frame
+        :param symbols: only these symbols
+        :param expiry: only these expiry dates
+        :param instruments: only these instruments, like FUTSTK or OPTIDX
+        :param columns: columns returned, all when None. columns missing in the partition of a day, stored before they were added, are NaN
+        """
+        filters = {'SYMBOL': symbols, 'INSTRUMENT': instruments}
+        expiry = None if expiry is None else np.array(expiry, dtype='datetime64[D]')
+        parts = {}
+        # columns of the empty frame returned when no row matches
+        schema = ['SYMBOL']
+        for date in sorted(d for d in self.days() if start <= d <= end):
+            path = self.__partition(date)
+            stored = list(np.load(os.path.join(path, '_columns.npy')))
+            if not stored:
+                continue
+            schema = stored
+            mask = None
+            for col, wanted in filters.items():
+                if wanted is None:
+                    continue
+                categories = np.load(os.path.join(path, f'{col}.categories.npy'))
+                wanted_codes = np.flatnonzero(np.isin(categories, wanted))
+                col_mask = np.isin(np.load(os.path.join(path, f'{col}.codes.npy'), mmap_mode='r'), wanted_codes)
+                mask = col_mask if mask is None else mask & col_mask
+                if not mask.any():
+                    break
+            if mask is not None and not mask.any():
+                continue
+            if expiry is not None:
+                col_mask = np.isin(np.load(os.path.join(path, 'EXPIRY_DT.npy'), mmap_mode='r'), expiry)
+                mask = col_mask if mask is None else mask & col_mask
+                if not mask.any():
+                    continue
+            rows = None if mask is None else int(mask.sum())
+            for col in (columns or stored):
+                if col not in stored:
+                    if rows is None:
+                        rows = len(np.load(os.path.join(path, 'SYMBOL.codes.npy'), mmap_mode='r'))
+                    values = (pd.Categorical.from_codes(np.full(rows, -1), pd.Index([], dtype=str)) if col in self.categoricals
+                              else np.full(rows, np.datetime64('NaT'), dtype='datetime64[D]') if col in self.dates
+                              else np.full(rows, np.nan))
+                elif col in self.categoricals:
+                    codes = np.load(os.path.join(path, f'{col}.codes.npy'), mmap_mode='r')
+                    values = pd.Categorical.from_codes(
+                        np.asarray(codes if mask is None else codes[mask]), np.load(os.path.join(path, f'{col}.categories.npy')))
+                else:
+                    values = np.load(os.path.join(path, f'{col}.npy'), mmap_mode='r')
+                    values = np.array(values if mask is None else values[mask])
+                parts.setdefault(col, []).append(values)
+        if not parts:
+            return pd.DataFrame(columns=columns or schema)
+        return pd.DataFrame({
+            col: pd.api.types.union_categoricals(values) if col in self.categoricals else np.concatenate(values)
+            for col, values in parts.items()
+        })
@@ -1,8 +1,15 @@
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging, yaml, time, os, traceback, pandas as pd
 from calculations.calculations import *
 from market import nse, moneycontrol
 from xl_io.xlreadwrite import *
+from xl_io.backends import getBackend
+from xl_io.writer import BackgroundWriter
+from scheduler.scheduler import MarketHoursScheduler
+from store.snapshots import SnapshotStore
+from sinks.sinks import getSink
+from metrics.metrics import metrics, span
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -13,8 +20,31 @@ errorCount, maxErrorCount = 0, 5
 inputFile = os.path.join(os.getcwd(),'configs','config.yaml')
 defaultInput = {
         'output_excel_file': 'Output.xlsx',
+        'output_backend': 'xlwings',
         'run_interval_mins': 3, 
+        'market_open_time': '09:15:30',
+        'market_close_time': '15:30:00',
+        'market_status_ttl_mins': 15,
         'expiry_date': '',
+        'max_in_flight_requests': 8,
+        'nse_requests_per_sec': 3,
+        'batched_compute': False,
+        'background_writer': True,
+        'sinks': [],
+        'metrics': {
+            'prometheus_file': '',
+            'http_port': 0
+        },
+        'snapshot_store': {
+            'enabled': False,
+            'directory': 'snapshots',
+            'retention_days': 5
+        },
+        'moneycontrol': {
+            'timeout_secs': 10,
+            'cache_ttl_secs': 60,
+            'host': ''
+        },
         'stocks':{
             'names': [],
             'price_multiple': 1,
@@ -27,6 +57,20 @@ defaultInput = {
     # }
     }
 input:dict={}
+outputBackend = None
+outputWriter = None
+snapshotStore = None
+outputSinks, outputSinksFor = [], None
+# sheet name -> fingerprint, sheet data and dashboard rows of the last calculation of that sheet
+computeCache: dict = {}
+computeCacheFor = None
+# sheets calculated or reused in the current cycle
+cycleSheets: set = set()
+# columns of the dashboard tables, also written when no symbol has rows
+optionsDashboardColumns = ['Symbol', 'Expiry Date', 'Strike Price', 'Activity1', 'Activity2', 'Activity3', 'Activity4', 'CE.Value', 'PE.Value']
+futuresDashboardColumns = ['SYMBOL', 'EXPIRY', 'LTP', 'Price Change', 'HIGH', 'LOW', 'FUTURE OI CHG%', 'SUPPORT1', 'SUPPORT2', 'RESISTANCE1', 'RESISTANCE2']
+# symbols (per expiry) calculated and skipped as unchanged in the last cycle
+cycleStats = {'computed': 0, 'skipped': 0}
 
 def setInput():
     global input
@@ -37,69 +81,404 @@ def setInput():
             logging.debug(f'yaml data to dict: {tmpInput}')
             for key in defaultInput.keys():
                 if key in tmpInput:
-                    input[key] = tmpInput[key]
+                    if isinstance(defaultInput[key], dict) and isinstance(tmpInput[key], dict):
+                        input[key] = {**defaultInput[key], **tmpInput[key]}
+                    else:
+                        input[key] = tmpInput[key]
     except Exception as e:
         logging.warning(f'{e}')
 
+def getOutputBackend():
+    '''
+    Returns the output backend named in the input, it is created once and kept across cycles.
+    '''
+    global outputBackend
+    if outputBackend is None or outputBackend.name != input['output_backend']:
+        logging.info(f'using output backend: {input["output_backend"]}')
+        outputBackend = getBackend(input['output_backend'])
+    return outputBackend
+
+def getOutputWriter(outputFile: str):
+    '''
+    Returns the background writer for outputFile, None when background_writer is disabled. The writer is recreated, after writing what is pending, when the output file or backend changes.
+    '''
+    global outputWriter
+    backend = getOutputBackend()
+    if outputWriter is not None and (not input['background_writer'] or outputWriter.outputFile != outputFile or outputWriter.backend is not backend):
+        shutdownOutputWriter()
+    if input['background_writer'] and outputWriter is None:
+        outputWriter = BackgroundWriter(outputFile, backend, onError=forgetComputed)
+    return outputWriter
+
+def shutdownOutputWriter(timeout: float = None) -> None:
+    '''
+    Writes the pending updates of the background writer and stops it.
+    '''
+    global outputWriter
+    if outputWriter is None:
+        return
+    logging.info(f'flushing {outputWriter.backlog} pending updates for {outputWriter.outputFile}')
+    if not outputWriter.shutdown(timeout):
+        logging.warning(f'output writer did not finish within {timeout} seconds')
+    outputWriter = None
+
+def getSnapshotStore():
+    '''
+    Returns the snapshot store configured in the input, None when it is disabled.
+    '''
+    global snapshotStore
+    config = input['snapshot_store']
+    if not config['enabled']:
+        return None
+    if snapshotStore is None or snapshotStore.directory != config['directory']:
+        logging.info(f'storing option chain snapshots in: {config["directory"]}')
+        snapshotStore = SnapshotStore(config['directory'], retentionDays=int(config['retention_days']))
+    snapshotStore.retentionDays = int(config['retention_days'])
+    return snapshotStore
+
+def stackCycleChains(optionsChains: dict) -> pd.DataFrame:
+    '''
+    Returns the option chains of all symbols and expiries of the cycle, a dict of symbol to the dict returned by nse.getOptionChains, stacked into one frame.
+    '''
+    return stackOptionChains({stockName: pd.concat(list(chains.values()), ignore_index=True) for stockName, chains in optionsChains.items() if chains})
+
+def stackCalculatedChains(stockNames: list, expiryDates: dict) -> pd.DataFrame:
+    '''
+    Returns the calculated option chains, with the signal columns, of the sheets calculated or reused in the cycle stacked into one frame with a 'Symbol' column.
+    '''
+    calculatedChains = {}
+    for stockName in stockNames:
+        sheetNames = [getSheetName(stockName, expiryDate, expiryDates) for expiryDate in expiryDates]
+        updatedDfs = [computeCache[sheetName]['updatedDf'] for sheetName in sheetNames if sheetName in cycleSheets and sheetName in computeCache]
+        if updatedDfs:
+            calculatedChains[stockName] = pd.concat(updatedDfs, ignore_index=True)
+    return stackOptionChains(calculatedChains)
+
+def storeSnapshot(chainsDf: pd.DataFrame) -> None:
+    '''
+    Appends the option chains of the cycle, as returned by stackCycleChains, to the snapshot store when it is enabled.
+    '''
+    store = getSnapshotStore()
+    if store is None or chainsDf.empty:
+        return
+    try:
+        with span('snapshots.append'):
+            store.append(chainsDf)
+    except Exception as e:
+        logging.warning(f'could not store option chain snapshot: {e}')
+
+def getOutputSinks() -> list:
+    '''
+    Returns the output sinks configured in the input, each item of sinks is the sink type and its options, e.g. {type: parquet, directory: output/parquet}. The sinks are recreated when the configuration changes.
+    '''
+    global outputSinks, outputSinksFor
+    if outputSinksFor != input['sinks']:
+        for sink in outputSinks:
+            sink.close()
+        outputSinks = []
+        for config in input['sinks'] or []:
+            options = dict(config)
+            try:
+                outputSinks.append(getSink(options.pop('type'), **options))
+                logging.info(f'writing to output sink: {config}')
+            except Exception as e:
+                logging.warning(f'could not create output sink {config}: {e}')
+        outputSinksFor = input['sinks']
+    return outputSinks
+
+def writeSinks(tables: dict, timestamp: datetime = None) -> None:
+    '''
+    Appends the frames in tables, a dict of table name to dataframe, to every configured output sink. A failing sink does not stop the others.
+    '''
+    timestamp = timestamp or datetime.now().replace(microsecond=0)
+    for sink in getOutputSinks():
+        for table, df in tables.items():
+            if df.empty:
+                continue
+            try:
+                with span(f'sinks.{sink.name}'):
+                    sink.write(table, df, timestamp)
+            except Exception as e:
+                logging.warning(f'could not write {table} to {sink.name} sink: {e}')
+
+def getExpiryDates() -> dict:
+    '''
+    Returns a dict of the expiry dates in the input, as written in the input (DD-MMM-YY), to their dates. expiry_date can be a single date or a list of dates.
+    '''
+    expiryDates = input['expiry_date'] if isinstance(input['expiry_date'], list) else [input['expiry_date']]
+    return {str(expiryDate): datetime.strptime(str(expiryDate),'%d-%b-%y').date() for expiryDate in expiryDates}
+
+def getSheetName(stockName: str, expiryDate: str, expiryDates: dict) -> str:
+    '''
+    Returns the sheet name for the option chain of stockName, the expiry is added only when more than one expiry is analysed.
+    '''
+    return stockName if len(expiryDates) == 1 else f'{stockName} {expiryDate}'
+
 def processInput():
     logging.info('Inside processInput()')
-    expiryDate = datetime.strptime(input['expiry_date'],'%d-%b-%y').date()
+    expiryDates = getExpiryDates()
+    logging.debug(f'expiry dates: {list(expiryDates)}')
     stockNames = input['stocks']['names']
     logging.debug(f'stock names: {stockNames}')
     outputFile = input['output_excel_file']
     logging.debug(f'outputFile: {outputFile}')
-    logging.info(f'calling getDataFrame to get Options data from moneycontrol')
-    mcOptsDf = moneycontrol.getDataFrame('options', input['expiry_date'])
-    logging.info(f'calling getDataFrame to get Futures data from moneycontrol')
-    mcFutDf = moneycontrol.getDataFrame('futures', input['expiry_date'])
-    optionsDashboardDf = futuresDashboardDf = pd.DataFrame()
-    for stockName in stockNames:
+    logging.info(f'calling getDataFrames to get Options and Futures data from moneycontrol')
+    mcDfs = moneycontrol.getDataFrames(list(expiryDates), timeout=input['moneycontrol']['timeout_secs'], cacheTtl=input['moneycontrol']['cache_ttl_secs'], host=input['moneycontrol']['host'] or None)
+    mcOptsDf, mcFutDf = mcDfs['options'], mcDfs['futures']
+    logging.debug(f'indexing moneycontrol frames for dashboard lookups')
+    mcOptsIdx = {expiryDate: moneycontrol.indexDataFrame('options', mcOptsDf[mcOptsDf['Expiry Date'] == expiryDate]) for expiryDate in expiryDates}
+    mcFutIdx = {expiryDate: moneycontrol.indexDataFrame('futures', mcFutDf[mcFutDf['Expiry Date'] == expiryDate]) for expiryDate in expiryDates}
+    logging.info(f'refreshing F&O quote snapshot')
+    nse.setRateLimit(float(input['nse_requests_per_sec']))
+    nse.refreshQuoteSnapshot()
+    resetComputeCache(outputFile)
+    maxInFlight = max(1, int(input['max_in_flight_requests']))
+    logging.debug(f'fetching option chains with max {maxInFlight} requests in flight')
+    writer = getOutputWriter(outputFile)
+    if writer is not None:
+        logging.info(f'output writer backlog: {writer.backlog}, stats: {writer.stats}')
+    try:
+        with WorkbookSession(outputFile, getOutputBackend(), writer) as session, ThreadPoolExecutor(max_workers=maxInFlight, thread_name_prefix='fetch') as executor:
+            futureToStock = {
+                executor.submit(nse.getOptionChains, stockName, list(expiryDates.values()), recordsLimitUpperLower=input['stocks']['oi_records_upper_lower_limit'], priceMultiple=input['stocks']['price_multiple']): stockName
+                for stockName in stockNames
+            }
+            optionsChains = {}
+            if input['batched_compute']:
+                optionsDashboardDfs, futuresDashboardDfs = processBatched(session, futureToStock, expiryDates, mcOptsIdx, mcFutIdx, optionsChains)
+            else:
+                optionsDashboardDfs, futuresDashboardDfs = processStreaming(session, futureToStock, expiryDates, mcOptsIdx, mcFutIdx, optionsChains)
+            chainsDf = stackCycleChains(optionsChains)
+            storeSnapshot(chainsDf)
+            # results arrive in completion order, keep the dashboards in symbol order
+            optionsDashboardDf = concatSorted(optionsDashboardDfs, 'Symbol', optionsDashboardColumns)
+            futuresDashboardDf = concatSorted(futuresDashboardDfs, 'SYMBOL', futuresDashboardColumns)
+            logging.debug(f'staging dashboard tables')
+            session.updateDashboardTable(sheetName = 'Dashboard', tableName = 'OptionsDashboard', startCell = 'A1', dataFrame = optionsDashboardDf)
+            session.updateDashboardTable(sheetName = 'Dashboard', tableName = 'FuturesDashboard', startCell = 'K1', dataFrame = futuresDashboardDf)
+            session.updateSheet('Stock Options', mcOptsDf, startCell='A1')
+            writeSinks({'option_chains': stackCalculatedChains(stockNames, expiryDates), 'options_dashboard': optionsDashboardDf, 'futures_dashboard': futuresDashboardDf, 'mc_options': mcOptsDf})
+            logging.info(f'calculated {cycleStats["computed"]}, skipped {cycleStats["skipped"]} unchanged option chains')
+            logging.debug(f'saving all updates of the cycle to {outputFile}')
+    except Exception:
+        # the staged sheets were discarded or not written, calculate them again next cycle
+        computeCache.clear()
+        raise
+
+
+def resetComputeCache(outputFile: str) -> None:
+    '''
+    Resets the cycle stats, the cached results are dropped when the output file or backend changed since they were written or the backend created a new workbook after sheets were reused.
+    '''
+    global computeCacheFor
+    backend = getOutputBackend()
+    cacheFor = (outputFile, backend.name, id(backend), backend.workbooksCreated)
+    # a workbook created while only calculated sheets were cached has all of them
+    if computeCacheFor is None or computeCacheFor[:3] != cacheFor[:3] or (computeCacheFor != cacheFor and cycleStats['skipped']):
+        computeCache.clear()
+    computeCacheFor = cacheFor
+    cycleStats.update(computed=0, skipped=0)
+    cycleSheets.clear()
+
+def reuseComputed(session: WorkbookSession, sheetName: str, fingerprint: str, optionsDashboardDfs: list, futuresDashboardDfs: list) -> bool:
+    '''
+    Reuses the dashboard rows of the last calculation of sheetName when its fingerprint did not change, only the timestamp of the sheet is updated, or the whole sheet if the workbook lost it. Returns False when sheetName has to be calculated.
+    '''
+    cached = computeCache.get(sheetName)
+    if cached is None or cached['fingerprint'] != fingerprint:
+        return False
+    logging.debug(f'{sheetName} unchanged, reusing the previous results')
+    optionsDashboardDfs.append(cached['optionsDf'])
+    futuresDashboardDfs.append(cached['futuresDf'])
+    session.touchSheet(sheetName, startCell='A1', df=cached['updatedDf'])
+    cycleSheets.add(sheetName)
+    cycleStats['skipped'] += 1
+    return True
+
+def forgetComputed(updates: dict) -> None:
+    '''
+    Drops the cached results of the sheets in updates, staged updates that were not written, so they are calculated and written again next cycle. Called by the output writer when a write fails.
+    '''
+    for sheetName, tableName in updates:
+        if tableName is None and computeCache.pop(sheetName, None) is not None:
+            logging.debug(f'{sheetName} was not written, it is calculated again next cycle')
+
+def cacheComputed(sheetName: str, fingerprint: str, updatedDf: pd.DataFrame, optionsDf: pd.DataFrame, futuresDf: pd.DataFrame) -> None:
+    computeCache[sheetName] = {'fingerprint': fingerprint, 'updatedDf': updatedDf, 'optionsDf': optionsDf, 'futuresDf': futuresDf}
+    cycleSheets.add(sheetName)
+    cycleStats['computed'] += 1
+
+def computeSymbol(session: WorkbookSession, stockName: str, expiryDate: str, expiryDates: dict, optionsChainData: pd.DataFrame, mcOptsIdx: dict, mcFutIdx: dict, fingerprint: str, optionsDashboardDfs: list, futuresDashboardDfs: list) -> None:
+    '''
+    Calculates the option chain of stockName for expiryDate, appends its dashboard rows to the lists and stages its sheet. Raises IndexError when the chain has less than two strikes with volume for support/resistance, nothing is added then.
+    '''
+    logging.debug(f'calling calculateAndUpdate for {stockName} {expiryDate}')
+    updatedDf = calculateAndUpdateOptionChainDf(stockName, optionsChainData)
+    logging.debug(f'calling getSupportResistancePricesCePe for {stockName} {expiryDate}')
+    supportResistancePrices = getSupportResistancePricesCePe(updatedDf)
+    logging.debug(f'calling createDashboardDf for {stockName} {expiryDate}')
+    optionsDf = createOptionsDashboardDf(stockName, updatedDf, mcOptsIdx[expiryDate])
+    optionsDf.insert(1, 'Expiry Date', expiryDate)
+    logging.debug(f'calling createFuturesDashboardDf for {stockName} {expiryDate}')
+    futuresDf = createFuturesDashboardDf(stockName, mcFutIdx[expiryDate], supportResistancePrices)
+    futuresDf.insert(1, 'EXPIRY', expiryDate)
+    optionsDashboardDfs.append(optionsDf)
+    futuresDashboardDfs.append(futuresDf)
+    logging.debug(f'staging sheet update for {stockName} {expiryDate}')
+    sheetName = getSheetName(stockName, expiryDate, expiryDates)
+    session.updateSheet(sheetName, updatedDf, startCell='A1')
+    cacheComputed(sheetName, fingerprint, updatedDf, optionsDf, futuresDf)
+
+def processStreaming(session: WorkbookSession, futureToStock: dict, expiryDates: dict, mcOptsIdx: dict, mcFutIdx: dict, optionsChains: dict) -> tuple:
+    '''
+    Calculates every symbol as soon as its option chains arrive and stages its sheets, the option chains are collected in optionsChains by symbol. Returns the lists of options and futures dashboard frames.
+    '''
+    optionsDashboardDfs, futuresDashboardDfs = [], []
+    for future in as_completed(futureToStock):
+        stockName = futureToStock[future]
+        logging.debug(f'received option chains for {stockName}')
+        optionsChains[stockName] = future.result()
+        for expiryDate, expiry in expiryDates.items():
+            try:
+                optionsChainData = optionsChains[stockName][expiry]
+                fingerprint = getFingerprint(stockName, optionsChainData, mcOptsIdx[expiryDate], mcFutIdx[expiryDate])
+                if reuseComputed(session, getSheetName(stockName, expiryDate, expiryDates), fingerprint, optionsDashboardDfs, futuresDashboardDfs):
+                    continue
+                computeSymbol(session, stockName, expiryDate, expiryDates, optionsChainData, mcOptsIdx, mcFutIdx, fingerprint, optionsDashboardDfs, futuresDashboardDfs)
+            except Exception as e:
+                logging.debug(f'error occurred while processing {stockName} {expiryDate}: {traceback.format_exc()}')
+                continue
+    return optionsDashboardDfs, futuresDashboardDfs
+
+def computeBatch(changedChains: dict, mcOptsIdx: pd.DataFrame, mcFutIdx: pd.DataFrame) -> tuple:
+    '''
+    Calculates the option chains of changedChains, a dict of symbol to chain of one expiry, in single passes over the stacked frame. Returns the calculated chains stacked with 'Symbol' and the options and futures dashboards. Symbols without support/resistance prices are left out of all three, like computeSymbol does.
+    '''
+    stackedDf = stackOptionChains(changedChains)
+    logging.debug(f'calling calculateAndUpdate for {len(changedChains)} symbols')
+    updatedDf = calculateAndUpdateOptionChainDf('', stackedDf)
+    logging.debug(f'calling getSupportResistancePricesBatch')
+    supportResistanceDf = getSupportResistancePricesBatch(updatedDf)
+    supportResistanceDf = supportResistanceDf.dropna()
+    complete = updatedDf['Symbol'].isin(supportResistanceDf.index)
+    if not complete.all():
+        logging.debug(f'no support/resistance prices for {list(updatedDf.loc[~complete, "Symbol"].unique())}, leaving them out')
+        updatedDf = updatedDf[complete]
+    optionsDf = createOptionsDashboardDfBatch(updatedDf, mcOptsIdx)
+    futuresDf = createFuturesDashboardDfBatch(mcFutIdx, supportResistanceDf)
+    return updatedDf, optionsDf, futuresDf
+
+def processBatched(session: WorkbookSession, futureToStock: dict, expiryDates: dict, mcOptsIdx: dict, mcFutIdx: dict, optionsChains: dict) -> tuple:
+    '''
+    Waits for the option chains of all symbols, stacks them per expiry and calculates signals, support/resistance and both dashboards in single passes over the stacked frame, the option chains are collected in optionsChains by symbol. When a pass fails the symbols of that expiry are calculated one by one, so a bad symbol only drops itself. Returns the lists of options and futures dashboard frames.
+    '''
+    for future in as_completed(futureToStock):
+        stockName = futureToStock[future]
+        logging.debug(f'received option chains for {stockName}')
+        optionsChains[stockName] = future.result()
+    optionsDashboardDfs, futuresDashboardDfs = [], []
+    for expiryDate, expiry in expiryDates.items():
+        fingerprints, changedChains = {}, {}
+        for stockName, chains in optionsChains.items():
+            try:
+                if expiry not in chains:
+                    continue
+                fingerprints[stockName] = getFingerprint(stockName, chains[expiry], mcOptsIdx[expiryDate], mcFutIdx[expiryDate])
+                if not reuseComputed(session, getSheetName(stockName, expiryDate, expiryDates), fingerprints[stockName], optionsDashboardDfs, futuresDashboardDfs):
+                    changedChains[stockName] = chains[expiry]
+            except Exception as e:
+                logging.debug(f'error occurred while processing {stockName} {expiryDate}: {traceback.format_exc()}')
+        if not changedChains:
+            continue
+        logging.debug(f'calculating {len(changedChains)} changed option chains of {expiryDate}')
         try:
-            logging.debug(f'calling getOptionChain for {stockName}')
-            optionsChainData = pd.DataFrame(columns=[ 'strikePrice ', 'expiryDate ', 'PE.openInterest ', 'PE.changeinOpenInterest ', 'PE.pchangeinOpenInterest ', 'PE.totalTradedVolume ', 'PE.impliedVolatility ', 'PE.lastPrice ', 'PE.change ', 'PE.pChange ', 'PE.underlyingValue ', 'CE.openInterest ', 'CE.changeinOpenInterest ', 'CE.pchangeinOpenInterest ', 'CE.totalTradedVolume ', 'CE.impliedVolatility ', 'CE.lastPrice ', 'CE.change ', 'CE.pChange ', 'CE.underlyingValue ', 'PE_WRITING ', 'CE_WRITING ', 'PE_UNWINDING ', 'CE_UNWINDING'])
-            optionsChainData = nse.getOptionChain(stockName, expiryDate, recordsLimitUpperLower=input['stocks']['oi_records_upper_lower_limit'], priceMultiple=input['stocks']['price_multiple'])
-            logging.debug(f'calling calculateAndUpdate for {stockName}')
-            updatedDf = calculateAndUpdateOptionChainDf(stockName, optionsChainData)
-            logging.debug(f'calling getSupportResistancePricesCePe for {stockName}')
-            supportResistancePrices = getSupportResistancePricesCePe(updatedDf)
-            logging.debug(f'calling createDashboardDf for {stockName}')
-            optionsDashboardDf = pd.concat([optionsDashboardDf, createOptionsDashboardDf(stockName, updatedDf, mcOptsDf)])
-            logging.debug(f'calling appendToDashboardDF for {stockName}')
-            futuresDashboardDf = pd.concat([futuresDashboardDf, createFuturesDashboardDf(stockName, mcFutDf, supportResistancePrices)]).sort_values(by='SYMBOL')
-            # dashBoardDf = appendToDashboardDF(dashBoardDf, stockName, updatedDf, supportResistancePrices)
-            logging.debug(f'calling createUpdateSheet for {stockName}')
-            createUpdateSheet(outputFile, stockName, updatedDf, startCell='A1')
+            updatedDf, optionsDf, futuresDf = computeBatch(changedChains, mcOptsIdx[expiryDate], mcFutIdx[expiryDate])
         except Exception as e:
-            logging.debug(f'error occurred while processing {stockName}: {traceback.format_exc()}')
+            logging.warning(f'batched calculation of {expiryDate} failed, calculating its symbols one by one: {e}')
+            logging.debug(traceback.format_exc())
+            for stockName, optionsChainData in changedChains.items():
+                try:
+                    computeSymbol(session, stockName, expiryDate, expiryDates, optionsChainData, mcOptsIdx, mcFutIdx, fingerprints[stockName], optionsDashboardDfs, futuresDashboardDfs)
+                except Exception as e:
+                    logging.debug(f'error occurred while processing {stockName} {expiryDate}: {traceback.format_exc()}')
             continue
-    logging.debug(f'calling createUpdateDashboardSheet')
-    createUpdateDashboardTable(outputFile, sheetName = 'Dashboard', tableName = 'OptionsDashboard', startCell = 'A1', dataFrame = optionsDashboardDf)
-    createUpdateDashboardTable(outputFile, sheetName = 'Dashboard', tableName = 'FuturesDashboard', startCell = 'K1', dataFrame = futuresDashboardDf)
-    createUpdateSheet(input['output_excel_file'], 'Stock Options', mcOptsDf, startCell='A1')
+        optionsDf.insert(1, 'Expiry Date', expiryDate)
+        futuresDf.insert(1, 'EXPIRY', expiryDate)
+        optionsDashboardDfs.append(optionsDf)
+        futuresDashboardDfs.append(futuresDf)
+        optionsDfs = dict(tuple(optionsDf.groupby('Symbol', sort=False)))
+        futuresDfs = dict(tuple(futuresDf.groupby('SYMBOL', sort=False)))
+        for stockName, stockDf in updatedDf.groupby('Symbol', sort=False):
+            logging.debug(f'staging sheet update for {stockName} {expiryDate}')
+            sheetName = getSheetName(stockName, expiryDate, expiryDates)
+            sheetDf = stockDf.drop(columns='Symbol').reset_index(drop=True)
+            session.updateSheet(sheetName, sheetDf, startCell='A1')
+            cacheComputed(sheetName, fingerprints[stockName], sheetDf, optionsDfs.get(stockName, optionsDf.iloc[:0]), futuresDfs.get(stockName, futuresDf.iloc[:0]))
+    return optionsDashboardDfs, futuresDashboardDfs
+
+def concatSorted(dfs: list, sortBy: str, columns: list) -> pd.DataFrame:
+    '''
+    Concatenates the dashboard frames of the cycle once and sorts them by sortBy, keeping the order of rows with the same value. Without frames an empty frame with columns is returned.
+    '''
+    if not dfs:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(dfs, ignore_index=True).sort_values(by=sortBy, kind='mergesort')
+
+def exportMetrics(scheduler: MarketHoursScheduler) -> None:
+    '''
+    Closes the metrics of the cycle and exports them to the prometheus_file and/or the http_port of the input. Writes of the background writer still running are counted in the next cycle.
+    '''
+    config = input['metrics']
+    metrics.setGauge('symbols_computed', cycleStats['computed'], 'Option chains calculated in the last cycle.')
+    metrics.setGauge('symbols_skipped', cycleStats['skipped'], 'Unchanged option chains skipped in the last cycle.')
+    metrics.setGauge('missed_slots_total', scheduler.stats['missedSlots'], 'Schedule slots missed because a cycle overran.')
+    if outputWriter is not None:
+        metrics.setGauge('writer_backlog', outputWriter.backlog, 'Updates waiting for the output writer.')
+    summary = metrics.endCycle()
+    logging.info('cycle timings: ' + ', '.join(f'{stage} p50={s["p50"]:.3f}s p95={s["p95"]:.3f}s max={s["max"]:.3f}s n={s["count"]}' for stage, s in summary.items()))
+    try:
+        if config['http_port']:
+            metrics.serve(int(config['http_port']))
+        if config['prometheus_file']:
+            metrics.exportFile(config['prometheus_file'])
+    except Exception as e:
+        logging.warning(f'could not export metrics: {e}')
+
+def createScheduler() -> MarketHoursScheduler:
+    '''
+    Returns the scheduler for the main loop configured from the input.
+    '''
+    return MarketHoursScheduler(nse.capitalMarketStatus, intervalMins=float(input['run_interval_mins']), openTime=parseTime(input['market_open_time']), closeTime=parseTime(input['market_close_time']), statusTtlSecs=float(input['market_status_ttl_mins'])*60)
+
+def parseTime(value: str):
+    return datetime.strptime(str(value), '%H:%M:%S').time()
 
 if __name__ == '__main__':
-    while True:
-        try:
-            logging.info(f'setting input from input file: {inputFile}')
-            setInput()
-            mktStatus = nse.capitalMarketStatus()
-            logging.debug(f'{mktStatus}')
-            if "Close" not in mktStatus['marketStatus']:
+    logging.info(f'setting input from input file: {inputFile}')
+    setInput()
+    scheduler = createScheduler()
+    try:
+        while True:
+            scheduler.waitForNextSlot()
+            cycleStart = time.monotonic()
+            try:
+                logging.info(f'setting input from input file: {inputFile}')
+                setInput()
+                scheduler.configure(intervalMins=float(input['run_interval_mins']), openTime=parseTime(input['market_open_time']), closeTime=parseTime(input['market_close_time']))
                 logging.info(f'starting to process input')
                 processInput()
-                logging.info(f'getting stock options from moneycontrol and writing as a sheet in excel')
-            else:
-                logging.error(f'Capital market is closed, next trade date is {mktStatus["tradeDate"]}, market starts at 9:15 am.')
-                break
-        except Exception:
-            logging.warning(f'error has occured at: {datetime.now().time()}, error: \n{traceback.format_exc()}')
-            errorCount += 1
-            logging.warning(f'increasing error count to {errorCount}/{maxErrorCount}')
-            if errorCount >= maxErrorCount:
-                logging.warning('Max error count reached, will throw error and exit.')
-                logging.error(f'{traceback.format_exc()}')  
-        finally:
-            logging.info(f'sleeping')
-            # logging.debug(f'input: \n{input}')
-            time.sleep(int(input['run_interval_mins'])*60)
-
+            except Exception:
+                logging.warning(f'error has occured at: {datetime.now().time()}, error: \n{traceback.format_exc()}')
+                errorCount += 1
+                logging.warning(f'increasing error count to {errorCount}/{maxErrorCount}')
+                if errorCount >= maxErrorCount:
+                    logging.warning('Max error count reached, will throw error and exit.')
+                    logging.error(f'{traceback.format_exc()}')  
+            finally:
+                scheduler.recordCycle(time.monotonic() - cycleStart)
+                metrics.observe('cycle', time.monotonic() - cycleStart)
+                exportMetrics(scheduler)
+    finally:
+        shutdownOutputWriter()
+        for sink in outputSinks:
+            sink.close()
@@ -1,7 +1,9 @@
-import logging
+import logging, hashlib, os, threading, time
 from urllib import parse
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
 import pandas as pd, requests
+from metrics.metrics import timed
 
 logging.basicConfig(level=logging.DEBUG)
 stockOptsPage = {
@@ -21,17 +23,44 @@ stockFutPage = {
                                     }
                 }
 commonHeaders = {'user-agent': 'fno_analyser'}
+# scheme and host the pages are requested from instead of the one in their url, e.g. a local replay server
+hostOverride = os.environ.get('MONEYCONTROL_HOST')
+requestTimeoutSecs = 10
+cacheTtlSecs = 60
+# (instrument, expiryDates, url) -> {'fetchedAt', 'pageHash', 'df'}
+_cache: dict = {}
+_cacheLock = threading.Lock()
+indexKeys = {
+                'options': ['Symbol', 'Strike Price', 'Option Type'],
+                'futures': ['Symbol']
+            }
 
-def getDataFrame(instrument:str, expiryDate:str, headers:dict=commonHeaders) -> pd.DataFrame:
+def getDataFrames(expiryDate, instruments:tuple=('options', 'futures'), headers:dict=commonHeaders, timeout:float=requestTimeoutSecs, cacheTtl:float=cacheTtlSecs, host:str=None) -> dict:
+    '''
+    fetches the pages of all instruments concurrently and returns a dict of instrument to the dataframe returned by getDataFrame.
+    '''
+    logging.debug(f'fetching {instruments} from moneycontrol concurrently')
+    with ThreadPoolExecutor(max_workers=len(instruments), thread_name_prefix='moneycontrol') as executor:
+        futures = {instrument: executor.submit(getDataFrame, instrument, expiryDate, headers, timeout, cacheTtl, host) for instrument in instruments}
+        return {instrument: future.result() for instrument, future in futures.items()}
+
+def getDataFrame(instrument:str, expiryDate, headers:dict=commonHeaders, timeout:float=requestTimeoutSecs, cacheTtl:float=cacheTtlSecs, host:str=None) -> pd.DataFrame:
     '''
     scrapes moneycontrol.com and returns a pandas dataframe containing either stock options chain or futures, depending on the 'instrument' parameter passed. The returned dataframe is sorted decreasingly by 'Value (Rs. Lakh)' column.
+    Dataframes are cached per (instrument, expiry dates) for cacheTtl seconds, after that the page is downloaded again but only parsed if its content changed. When the download exceeds timeout the cached dataframe, however old, is returned and the page is downloaded again on the next call.
     ### Parameters
     1. instrument : str 
                 financial instrument, accepted values: 'options', 'futures'
-    2. expiryMonth : int
-                expiry month index of the intrument, accepted values: 1(current month), 2(next month), 3(next to next month)
+    2. expiryDate : str | list
+                expiry date(s) of the instrument as shown by moneycontrol (DD-MMM-YY), rows of all given expiries are returned
     3. headers : dict
                 headers to be passed while fetching the page for moneycontrol.com
+    4. timeout : float
+                deadline in seconds for downloading the whole page
+    5. cacheTtl : float
+                seconds for which the cached dataframe is returned without downloading the page
+    6. host : str
+                scheme and host to request the page from, like http://127.0.0.1:8765, defaults to hostOverride (MONEYCONTROL_HOST environment variable) and then to the host in the page's url
     '''
 
     logging.debug('inside getStockOptions in moneycontrol module')
@@ -44,31 +73,209 @@ def getDataFrame(instrument:str, expiryDate:str, headers:dict=commonHeaders) ->
         raise ValueError(f'invalid instrument passed: {instrument}, accepted values: futures, options')
     # if 3 < expiryMonth or expiryMonth < 0:
     #     raise ValueError(f'expiryMonth should be either 1, 2, 3. got: {expiryMonth}')
-    url=instrumentDetails['url']
+    url=withHost(instrumentDetails['url'], host or hostOverride)
     # urlParts = parse.urlparse(url)
     # qs = parse.parse_qsl(urlParts.query)
     # qs[2] = ('sel_mth', str(expiryMonth))
     # url = parse.urlunparse((urlParts.scheme, urlParts.netloc, urlParts.path, urlParts.params, parse.urlencode(qs), urlParts.fragment))
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        raise response.raise_for_status()
-    df = pd.read_html(_getTable(response.text, instrumentDetails['tbl_attr']))[0]
-    df = df[(df['Expiry Date'] == expiryDate)].reset_index(drop=True)
-    logging.debug(f'dataframe generated: {df}')
-    logging.info(f'Splitting columns: {instrumentDetails["cols_to_split"]}')
-    for col, newcols in instrumentDetails['cols_to_split'].items():
-        df[newcols] = df[col].str.split(expand=True)
-        df = df.drop(col, axis=1)
+    expiryDates = tuple(expiryDate) if isinstance(expiryDate, (list, tuple)) else (expiryDate,)
+    key = (instrument, expiryDates, url)
+    with _cacheLock:
+        cached = _cache.get(key)
+    if cached is not None and time.monotonic() - cached['fetchedAt'] < cacheTtl:
+        logging.debug(f'returning cached {instrument} dataframe for {expiryDate}')
+        return cached['df']
+    try:
+        page = _fetchPage(url, headers, timeout)
+    except (TimeoutError, requests.Timeout) as e:
+        if cached is None:
+            raise
+        logging.warning(f'{e}, returning the {instrument} dataframe cached {time.monotonic() - cached["fetchedAt"]:.0f} seconds ago')
+        return cached['df']
+    pageHash = hashlib.sha1(page).hexdigest()
+    if cached is not None and cached['pageHash'] == pageHash:
+        logging.debug(f'{instrument} page unchanged, reusing parsed dataframe')
+        df = cached['df']
+    else:
+        df = _parseTable(page.decode('utf-8', errors='replace'), instrumentDetails['tbl_attr'], instrumentDetails['cols_to_split'])
+        df = df[df['Expiry Date'].isin(expiryDates)].reset_index(drop=True)
+        logging.debug(f'dataframe generated: {df}')
+    with _cacheLock:
+        _cache[key] = {'fetchedAt': time.monotonic(), 'pageHash': pageHash, 'df': df}
     return df
 
-def _getTable(mcHtmlPage:str, attribs:dict) -> str:
+def withHost(url:str, host:str=None) -> str:
+    '''
+    returns url with its scheme and host replaced by those of host, url as it is when host is empty.
+    '''
+    if not host:
+        return url
+    urlParts, hostParts = parse.urlsplit(url), parse.urlsplit(host)
+    return parse.urlunsplit((hostParts.scheme, hostParts.netloc) + tuple(urlParts[2:]))
+
+@timed('moneycontrol.fetch')
+def _fetchPage(url:str, headers:dict, timeout:float) -> bytes:
+    '''
+    downloads url and returns its content, raises TimeoutError if the whole download takes more than timeout seconds. requests' own timeout only bounds the connect and each read, so every read of the body is given the time left until the deadline.
+    '''
+    deadline = time.monotonic() + timeout
+    with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            response.raise_for_status()
+            raise requests.HTTPError(f'unexpected status {response.status_code} for {url}', response=response)
+        sock = _socketOf(response)
+        chunks = []
+        try:
+            for chunk in _readsUntil(response, sock, deadline):
+                chunks.append(chunk)
+        except requests.ConnectionError as e:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f'download of {url} exceeded {timeout} seconds') from e
+            raise
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'download of {url} exceeded {timeout} seconds')
+    return b''.join(chunks)
+
+def _readsUntil(response, sock, deadline:float):
+    '''
+    yields the chunks of response, setting the read timeout of sock to the time left until deadline before every read.
+    '''
+    chunks = response.iter_content(chunk_size=65536)
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if sock is not None:
+            try:
+                sock.settimeout(remaining)
+            except OSError:
+                # closed once the whole body was read
+                sock = None
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+def _socketOf(response):
+    '''
+    returns the socket the body of response is read from, None when urllib3 does not expose it (reads then keep the timeout of the request).
+    '''
+    try:
+        return response.raw._fp.fp.raw._sock
+    except AttributeError:
+        return None
+
+def indexDataFrame(instrument:str, df: pd.DataFrame) -> pd.DataFrame:
     '''
-    Get HTML code for table as extracted as per the HTML attribs passed, the function also replaces the br in mcHtmlPage table rows with a whitespace.
+    returns the dataframe from getDataFrame indexed for O(1) lookups, by Symbol for 'futures' and by (Symbol, Strike Price, Option Type) for 'options'. Call it once per cycle and pass the result to the dashboard builders. When a key repeats the first row, i.e. the one with the highest 'Value (Rs. Lakh)', is kept.
     '''
-    logging.debug('inside _getTable')
-    soup = BeautifulSoup(mcHtmlPage)
-    table = soup.find('table', attrs=attribs)
-    for tr in table.find_all('tr'):
-        for br in tr.find_all('br'):
-            br = br.replace_with(' ')
-    return str(table)
\ No newline at end of file
+    if instrument not in indexKeys:
+        raise ValueError(f'invalid instrument passed: {instrument}, accepted values: futures, options')
+    keys = indexKeys[instrument]
+    df = df.copy()
+    if 'Strike Price' in keys:
+        df['Strike Price'] = pd.to_numeric(df['Strike Price'], errors='coerce').astype(float)
+    return df.drop_duplicates(keys).set_index(keys).sort_index()
+
+class _TableParser(HTMLParser):
+    '''
+    Collects the header and rows of the first table matching attribs in a single pass, a br inside a cell is read as a whitespace. Tables nested inside it are skipped.
+    '''
+    def __init__(self, attribs:dict):
+        super().__init__(convert_charrefs=True)
+        self.attribs = attribs
+        self.depth = 0
+        self.done = False
+        self.header = []
+        self.rows = []
+        self._row = None
+        self._cell = None
+        self._isHeaderRow = False
+
+    def _matches(self, attrs:dict) -> bool:
+        return all(value in (attrs.get(key) or '').split() for key, value in self.attribs.items())
+
+    def _closeCell(self):
+        if self._cell is not None:
+            self._row.append(' '.join(''.join(self._cell).split()))
+            self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'table':
+            if self.depth or self._matches(dict(attrs)):
+                self.depth += 1
+            return
+        if self.depth != 1:
+            return
+        if tag == 'tr':
+            self._row, self._cell, self._isHeaderRow = [], None, False
+        elif tag in ('td', 'th') and self._row is not None:
+            self._closeCell()
+            self._cell = []
+            self._isHeaderRow = self._isHeaderRow or tag == 'th'
+        elif tag == 'br' and self._cell is not None:
+            self._cell.append(' ')
+
+    def handle_endtag(self, tag):
+        if self.done or not self.depth:
+            return
+        if tag == 'table':
+            self.depth -= 1
+            self.done = self.depth == 0
+        elif self.depth != 1 or self._row is None:
+            return
+        elif tag in ('td', 'th'):
+            self._closeCell()
+        elif tag == 'tr':
+            self._closeCell()
+            if self._isHeaderRow:
+                self.header = self.header or self._row
+            elif self._row:
+                self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self.depth == 1 and self._cell is not None:
+            self._cell.append(data)
+
+def _toNumeric(values: pd.Series) -> pd.Series:
+    '''
+    Returns values as numbers when every non empty value is a number once ',' and a trailing '%' are removed, otherwise values as they are. '-' is read as empty.
+    '''
+    values = values.where(~values.isin(['', '-']))
+    converted = pd.to_numeric(values.str.replace(',', '', regex=False).str.rstrip('%'), errors='coerce')
+    return converted if converted.notna().sum() == values.notna().sum() else values
+
+@timed('moneycontrol.parse')
+def _parseTable(mcHtmlPage:str, attribs:dict, colsToSplit:dict, chunkSize:int = 65536) -> pd.DataFrame:
+    '''
+    Parses the table matching the HTML attribs into a dataframe with numeric columns typed, the columns in colsToSplit are split on whitespace into their new columns which are appended at the end. Only the page from the table onwards is read and parsing stops at the end of the table.
+    '''
+    logging.debug('inside _parseTable')
+    parser = _TableParser(attribs)
+    start = mcHtmlPage.find(next(iter(attribs.values()), ''))
+    start = max(mcHtmlPage.rfind('<table', 0, start), 0) if start != -1 else 0
+    for offset in range(start, len(mcHtmlPage), chunkSize):
+        parser.feed(mcHtmlPage[offset:offset+chunkSize])
+        if parser.done:
+            break
+    header, rows = parser.header, parser.rows
+    if not header and rows:
+        header, rows = rows[0], rows[1:]
+    if not header:
+        raise ValueError(f'no table found with attributes: {attribs}')
+    # rows not spanning the full header are banners/ads inside the table
+    rows = [row for row in rows if len(row) == len(header)]
+    columns = {col: [row[i] for row in rows] for i, col in enumerate(header) if col not in colsToSplit}
+    logging.info(f'Splitting columns: {colsToSplit}')
+    for col, newcols in colsToSplit.items():
+        i = header.index(col)
+        parts = [row[i].split(None, len(newcols)-1) for row in rows]
+        for j, newcol in enumerate(newcols):
+            columns[newcol] = [part[j] if len(part) > j else None for part in parts]
+    df = pd.DataFrame(columns, dtype=object)
+    for col in df.columns:
+        df[col] = _toNumeric(df[col])
+    return df
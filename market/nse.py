@@ -1,10 +1,38 @@
 from pynse import *
 import pandas as pd
-import logging, datetime, traceback
+import logging, datetime, traceback, threading
+from metrics.metrics import span, timed
 
 logging.basicConfig(level=logging.DEBUG)
 
-nse = Nse()
+# created by getNse on first use, importing this module does not touch ~/.pynse or the network
+nse = None
+nseLock = threading.Lock()
+# CE/PE fields of the option chain used by the analysis
+optionChainFields = ['openInterest', 'changeinOpenInterest', 'pchangeinOpenInterest', 'totalTradedVolume', 'impliedVolatility', 'lastPrice', 'change', 'pChange', 'underlyingValue']
+quoteSnapshot = pd.DataFrame()
+
+def getNse() -> Nse:
+    '''
+    returns the shared Nse, created on the first call
+    '''
+    global nse
+    if nse is None:
+        with nseLock:
+            if nse is None:
+                nse = Nse()
+    return nse
+
+def setRateLimit(requestsPerSec: float) -> None:
+    '''
+    limits the requests sent to NSE by all threads together to requestsPerSec per second, 0 for no limit. The limiter keeps its state while the rate is unchanged.
+    '''
+    rateLimiter = getNse().rate_limiter
+    if rateLimiter.rate != requestsPerSec:
+        logging.info(f'limiting NSE requests to {requestsPerSec or "unlimited"} per second')
+        rateLimiter.set_rate(requestsPerSec)
+
+@timed('nse.capitalMarketStatus')
 def capitalMarketStatus() -> dict:
     '''
     returns the current status of the Capital Market(NIFTY) in form of dict which contains other information like next trading date, etc
@@ -12,7 +40,7 @@ def capitalMarketStatus() -> dict:
     # nse.clear_data()
     logging.debug('inside capitalMarketStatus')
     try:
-        marketStatus = [market for market in nse.market_status()['marketState'] if market['market'] == 'Capital Market']
+        marketStatus = [market for market in getNse().market_status()['marketState'] if market['market'] == 'Capital Market']
         if len(marketStatus) != 0:
             return marketStatus[0]
         else:
@@ -23,20 +51,53 @@ def capitalMarketStatus() -> dict:
         logging.debug(f'error occurred in getOptionChain: {e.with_traceback()}')
         pass
 
+@timed('nse.quoteSnapshot')
+def refreshQuoteSnapshot() -> pd.DataFrame:
+    '''
+    downloads open/LTP/high/low of the whole F&O universe in one request and keeps it as the quote snapshot for the current cycle
+    '''
+    global quoteSnapshot
+    logging.debug('inside refreshQuoteSnapshot')
+    try:
+        quoteSnapshot = getNse().get_quotes(IndexSymbol.FnO)
+    except Exception as e:
+        logging.warning(f'could not download F&O quotes, falling back to per symbol quotes: {e}')
+        quoteSnapshot = pd.DataFrame()
+    return quoteSnapshot
+
+def getOpenPrice(symbol: str) -> float:
+    '''
+    returns the open price of symbol from the cycle's quote snapshot, only symbols missing in it (like indices) are quoted individually
+    '''
+    snapshot = quoteSnapshot
+    if symbol in snapshot.index:
+        return float(snapshot.at[symbol, 'open'])
+    return getNse().get_quote(symbol)['open']
+
 def getOptionChain(symbol:str, expiryDate: datetime.date, recordsLimitUpperLower: int = 10, priceMultiple:int = 1) -> pd.DataFrame:
     '''
     returns recordsLimitUpperLower number of options chains records for a stock symbol which are greater than its opening price and recordsLimitUpperLower number of options chains records for a stock symbol which are lesser than its opening price.
     '''
     logging.debug('inside getOptionChain')
-    colsToDrop = ['CE.strikePrice','CE.expiryDate','CE.identifier','CE.underlying','CE.totalBuyQuantity','CE.totalSellQuantity','CE.bidQty','CE.bidprice','CE.askQty','CE.askPrice','PE.strikePrice','PE.expiryDate','PE.identifier','PE.underlying','PE.totalBuyQuantity','PE.totalSellQuantity','PE.bidQty','PE.bidprice','PE.askQty','PE.askPrice']
-    filteredDf= pd.DataFrame()
+    return getOptionChains(symbol, [expiryDate], recordsLimitUpperLower, priceMultiple).get(expiryDate, pd.DataFrame())
+
+def getOptionChains(symbol:str, expiryDates: list, recordsLimitUpperLower: int = 10, priceMultiple:int = 1) -> dict:
+    '''
+    returns a dict of expiry date to the options chain records of that expiry as returned by getOptionChain, the option chain is downloaded once for all expiryDates. Expiries missing in the option chain are left out.
+    '''
+    logging.debug('inside getOptionChains')
+    chains = {}
     try:
-        openPrice = nse.get_quote(symbol)['open']
-        allChains = nse.option_chain(symbol, expiry=expiryDate).drop(colsToDrop, axis=1)
-        filteredDf = pd.concat([filteredDf,allChains[(allChains['strikePrice'] > openPrice) & (allChains['strikePrice'] % priceMultiple == 0)].head(recordsLimitUpperLower), allChains[(allChains['strikePrice'] <= openPrice) & (allChains['strikePrice'] % priceMultiple == 0)].tail(recordsLimitUpperLower)])
-        filteredDf['expiryDate'] = pd.to_datetime(filteredDf['expiryDate'], format='%Y-%m-%d')
-        filteredDf['expiryDate'] = filteredDf['expiryDate'].astype(str)
+        with span('nse.quote'):
+            openPrice = getOpenPrice(symbol)
+        with span('nse.optionChain'):
+            allChains = getNse().option_chain(symbol, expiry=list(expiryDates), fields=optionChainFields)
+        allChains = allChains[allChains['strikePrice'] % priceMultiple == 0]
+        for expiryDate, expiryChains in allChains.groupby('expiryDate', sort=False):
+            filteredDf = pd.concat([expiryChains[expiryChains['strikePrice'] > openPrice].head(recordsLimitUpperLower), expiryChains[expiryChains['strikePrice'] <= openPrice].tail(recordsLimitUpperLower)])
+            filteredDf['expiryDate'] = expiryDate.isoformat()
+            chains[expiryDate] = filteredDf.reset_index(drop=True)
     except Exception as e:
-        logging.debug(f'error occurred in getOptionChain: {traceback.format_exc()}')
+        logging.debug(f'error occurred in getOptionChains: {traceback.format_exc()}')
         pass
-    return filteredDf.reset_index(drop=True)
\ No newline at end of file
+    return chains
@@ -0,0 +1,122 @@
+import logging, os, tempfile, threading, time, functools
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+class Metrics:
+    '''
+    Collects the durations of timed spans of the running cycle from any thread. endCycle aggregates them per stage (count, p50, p95, max, sum) into lastCycle, which is exported in the Prometheus text format by toPrometheus, exportFile and serve. Gauges are exported as they were last set.
+    '''
+    prefix = 'fno'
+
+    def __init__(self) -> None:
+        self.lastCycle: dict = {}
+        self.gauges: dict = {}
+        self._spans: dict = {}
+        self._lock = threading.Lock()
+        self._text = ''
+        self._server = None
+
+    @contextmanager
+    def span(self, stage: str):
+        '''
+        Times the block and records its duration under stage.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str = None):
+        '''
+        Decorator timing every call of the function under stage, the function name by default.
+        '''
+        def decorator(fn):
+            name = stage or fn.__name__
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, stage: str, secs: float) -> None:
+        with self._lock:
+            self._spans.setdefault(stage, []).append(secs)
+
+    def setGauge(self, name: str, value: float, help: str = '') -> None:
+        with self._lock:
+            self.gauges[name] = (value, help)
+
+    def endCycle(self) -> dict:
+        '''
+        Aggregates the spans recorded since the last call into lastCycle and returns it, the text served and exported is refreshed.
+        '''
+        with self._lock:
+            spans, self._spans = self._spans, {}
+        self.lastCycle = {
+            stage: {'count': len(secs), 'p50': float(np.percentile(secs, 50)), 'p95': float(np.percentile(secs, 95)), 'max': max(secs), 'sum': sum(secs)}
+            for stage, secs in sorted(spans.items())
+        }
+        self._text = self.toPrometheus()
+        return self.lastCycle
+
+    def toPrometheus(self) -> str:
+        name = f'{self.prefix}_stage_seconds'
+        lines = [f'# HELP {name} Durations of the stages of the last cycle.', f'# TYPE {name} summary']
+        for stage, summary in self.lastCycle.items():
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('1', 'max')):
+                lines.append(f'{name}{{stage="{stage}",quantile="{quantile}"}} {summary[key]:.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {summary["sum"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {summary["count"]}')
+        with self._lock:
+            gauges = sorted(self.gauges.items())
+        for gauge, (value, help) in gauges:
+            lines += [f'# HELP {self.prefix}_{gauge} {help}', f'# TYPE {self.prefix}_{gauge} gauge', f'{self.prefix}_{gauge} {float(value)}']
+        return '\n'.join(lines) + '\n'
+
+    def exportFile(self, path: str) -> None:
+        '''
+        Writes the metrics of the last cycle to path, renamed into place so a collector (e.g. node_exporter's textfile collector) never reads a partial file.
+        '''
+        fd, tmpFile = tempfile.mkstemp(prefix='.~', suffix='.prom', dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, 'w') as f:
+            f.write(self._text)
+        os.replace(tmpFile, path)
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> None:
+        '''
+        Serves the metrics of the last cycle at http://host:port/metrics from a daemon thread.
+        '''
+        if self._server is not None:
+            return
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics._text.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f'metrics endpoint: {format % args}')
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        logging.info(f'serving metrics at http://{host}:{port}/metrics')
+
+    def stopServing(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# spans of every module are recorded here
+metrics = Metrics()
+span = metrics.span
+timed = metrics.timed
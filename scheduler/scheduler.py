@@ -0,0 +1,115 @@
+import logging, math, time
+import datetime as dt
+
+class MarketHoursScheduler:
+    '''
+    Fires cycles on fixed wall-clock slots (openTime, openTime + interval, ...) while the market is open. A cycle that overruns its slot makes the scheduler skip the missed slots instead of queueing them, outside market hours it sleeps until the next session opens.
+    marketStatusFn is expected to return the 'Capital Market' status dict of nse.capitalMarketStatus, it is called at most once every statusTtlSecs.
+    '''
+    def __init__(self, marketStatusFn, intervalMins: float = 3, openTime: dt.time = dt.time(9, 15, 30), closeTime: dt.time = dt.time(15, 30), statusTtlSecs: float = 900) -> None:
+        self.marketStatusFn = marketStatusFn
+        self.interval = dt.timedelta(minutes=intervalMins)
+        self.openTime = openTime
+        self.closeTime = closeTime
+        self.statusTtlSecs = statusTtlSecs
+        self.stats = {'cycles': 0, 'missedSlots': 0, 'lastCycleSecs': None, 'maxCycleSecs': 0., 'totalCycleSecs': 0.}
+        self._status = None
+        self._statusAt = 0.
+        self._lastSlot = None
+
+    def configure(self, intervalMins: float = None, openTime: dt.time = None, closeTime: dt.time = None) -> None:
+        '''
+        Updates the schedule, takes effect from the next slot.
+        '''
+        if intervalMins is not None:
+            self.interval = dt.timedelta(minutes=intervalMins)
+        self.openTime = openTime or self.openTime
+        self.closeTime = closeTime or self.closeTime
+
+    def marketStatus(self) -> dict:
+        '''
+        Returns the cached market status, refreshed once it is older than statusTtlSecs. Returns None if the status could not be fetched.
+        '''
+        if self._status is None or time.monotonic() - self._statusAt >= self.statusTtlSecs:
+            try:
+                status = self.marketStatusFn()
+            except Exception as e:
+                logging.warning(f'could not get market status: {e}')
+                status = None
+            if status is None:
+                return None
+            self._status, self._statusAt = status, time.monotonic()
+            logging.debug(f'market status: {status}')
+        return self._status
+
+    def nextSlot(self, now: dt.datetime) -> dt.datetime:
+        '''
+        Returns the first slot of today at or after now, it can be past closeTime.
+        '''
+        sessionOpen = dt.datetime.combine(now.date(), self.openTime)
+        if now <= sessionOpen:
+            return sessionOpen
+        slot = sessionOpen + math.ceil((now - sessionOpen) / self.interval) * self.interval
+        if self._lastSlot is not None and slot <= self._lastSlot:
+            slot = self._lastSlot + self.interval
+        return slot
+
+    def nextSessionOpen(self, today: dt.date) -> dt.datetime:
+        '''
+        Returns the open of the next weekday after today, holidays are caught by the market status when that session opens.
+        '''
+        day = today + dt.timedelta(days=1)
+        while day.weekday() >= 5:
+            day += dt.timedelta(days=1)
+        return dt.datetime.combine(day, self.openTime)
+
+    def waitForNextSlot(self) -> dt.datetime:
+        '''
+        Sleeps until the next slot in which the market is open and returns it.
+        '''
+        while True:
+            now = dt.datetime.now()
+            slot = self.nextSlot(now)
+            if now.weekday() >= 5 or slot.time() > self.closeTime:
+                self._sleepUntilSession(self.nextSessionOpen(now.date()))
+                continue
+            if self._lastSlot is not None and self._lastSlot.date() == slot.date():
+                missed = round((slot - self._lastSlot) / self.interval) - 1
+                if missed > 0:
+                    self.stats['missedSlots'] += missed
+                    logging.warning(f'previous cycle overran, skipping {missed} slot(s), total missed: {self.stats["missedSlots"]}')
+            self._lastSlot = slot
+            logging.info(f'sleeping until next slot: {slot.time()}')
+            self._sleepUntil(slot)
+            status = self.marketStatus()
+            if status is not None and 'Close' in status['marketStatus']:
+                logging.error(f'Capital market is closed, next trade date is {status.get("tradeDate")}, market starts at {self.openTime}.')
+                self._sleepUntilSession(self.nextSessionOpen(slot.date()))
+                continue
+            return slot
+
+    def recordCycle(self, cycleSecs: float) -> None:
+        '''
+        Records the latency of a finished cycle in stats.
+        '''
+        self.stats['cycles'] += 1
+        self.stats['lastCycleSecs'] = cycleSecs
+        self.stats['maxCycleSecs'] = max(self.stats['maxCycleSecs'], cycleSecs)
+        self.stats['totalCycleSecs'] += cycleSecs
+        logging.info(f'cycle took {cycleSecs:.1f}s, scheduler stats: {self.stats}')
+
+    def _sleepUntilSession(self, sessionOpen: dt.datetime) -> None:
+        logging.info(f'market closed, sleeping until next session opens at {sessionOpen}')
+        self._lastSlot = None
+        # status has to be checked again once the session opens
+        self._status = None
+        self._sleepUntil(sessionOpen)
+
+    @staticmethod
+    def _sleepUntil(target: dt.datetime) -> None:
+        # sleep in short steps so wall clock changes (suspend, ntp) are followed
+        while True:
+            remaining = (target - dt.datetime.now()).total_seconds()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 60))
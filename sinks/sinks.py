@@ -0,0 +1,145 @@
+import csv, os, sqlite3
+import datetime as dt
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+def partitionDir(directory: str, table: str, timestamp: dt.datetime) -> str:
+    '''
+    Returns the directory of the date partition of table, directory/table/date=YYYY-MM-DD, creating it if needed.
+    '''
+    partition = os.path.join(directory, table, f'date={timestamp.date().isoformat()}')
+    os.makedirs(partition, exist_ok=True)
+    return partition
+
+def withTimestamp(df: pd.DataFrame, timestamp: dt.datetime) -> pd.DataFrame:
+    df = df.reset_index(drop=True)
+    df.insert(0, 'timestamp', pd.Timestamp(timestamp))
+    return df
+
+class CsvSink:
+    '''
+    Appends the rows of every cycle to directory/table/date=YYYY-MM-DD/table.csv, the header is written when the file is created. Rows with other columns than the header of the file go to a new file, table-1.csv, table-2.csv...
+    '''
+    name = 'csv'
+
+    def __init__(self, directory: str = 'output/csv') -> None:
+        self.directory = directory
+        self.headers = {}
+
+    def _header(self, path: str) -> list:
+        if path not in self.headers:
+            with open(path, newline='') as f:
+                self.headers[path] = next(csv.reader(f), [])
+        return self.headers[path]
+
+    def write(self, table: str, df: pd.DataFrame, timestamp: dt.datetime) -> None:
+        df = withTimestamp(df, timestamp)
+        columns = [str(col) for col in df.columns]
+        partition = partitionDir(self.directory, table, timestamp)
+        path, n = os.path.join(partition, f'{table}.csv'), 1
+        while os.path.exists(path) and self._header(path) != columns:
+            path, n = os.path.join(partition, f'{table}-{n}.csv'), n + 1
+        df.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+        self.headers[path] = columns
+
+    def close(self) -> None:
+        pass
+
+class ParquetSink:
+    '''
+    Writes every cycle as a new file directory/table/date=YYYY-MM-DD/HHMMSS.parquet, files are never rewritten. The partitions can be read as one dataset with pyarrow.dataset or pandas.read_parquet(directory/table).
+    '''
+    name = 'parquet'
+    extension = 'parquet'
+
+    def __init__(self, directory: str = 'output/parquet') -> None:
+        if pa is None:
+            raise ImportError(f'pyarrow is required for the {self.name} output sink')
+        self.directory = directory
+
+    def _writeTable(self, arrowTable, path: str) -> None:
+        pq.write_table(arrowTable, path)
+
+    def write(self, table: str, df: pd.DataFrame, timestamp: dt.datetime) -> None:
+        partition, name = partitionDir(self.directory, table, timestamp), timestamp.strftime('%H%M%S')
+        path, n = os.path.join(partition, f'{name}.{self.extension}'), 1
+        while os.path.exists(path):
+            # never overwrite the file of an earlier write in the same second
+            path, n = os.path.join(partition, f'{name}-{n}.{self.extension}'), n + 1
+        tmpPath = path + '.tmp'
+        self._writeTable(pa.Table.from_pandas(withTimestamp(df, timestamp), preserve_index=False), tmpPath)
+        os.replace(tmpPath, path)
+
+    def close(self) -> None:
+        pass
+
+class ArrowSink(ParquetSink):
+    '''
+    Same layout as the parquet sink with Arrow IPC (Feather v2) files, cheaper to write and memory-mappable by readers.
+    '''
+    name = 'arrow'
+    extension = 'arrow'
+
+    def __init__(self, directory: str = 'output/arrow') -> None:
+        super().__init__(directory)
+
+    def _writeTable(self, arrowTable, path: str) -> None:
+        feather.write_feather(arrowTable, path)
+
+class SqliteSink:
+    '''
+    Appends the rows of every cycle to the table of the same name in a database per date, directory/YYYY-MM-DD.sqlite. Tables are created from the first frame written to them, rows with other columns go to a new table, table_1, table_2...
+    '''
+    name = 'sqlite'
+
+    def __init__(self, directory: str = 'output/sqlite') -> None:
+        self.directory = directory
+        self.date = None
+        self.connection = None
+        self.tables = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _connect(self, date: dt.date):
+        if date != self.date:
+            self.close()
+            self.connection = sqlite3.connect(os.path.join(self.directory, f'{date.isoformat()}.sqlite'))
+            self.date = date
+        return self.connection
+
+    def _columns(self, connection, table: str) -> list:
+        if table not in self.tables:
+            self.tables[table] = [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+        return self.tables[table]
+
+    def write(self, table: str, df: pd.DataFrame, timestamp: dt.datetime) -> None:
+        connection = self._connect(timestamp.date())
+        df = withTimestamp(df, timestamp).astype({'timestamp': str})
+        columns = [str(col) for col in df.columns]
+        name, n = table, 1
+        while self._columns(connection, name) not in ([], columns):
+            name, n = f'{table}_{n}', n + 1
+        with connection:
+            df.to_sql(name, connection, if_exists='append', index=False)
+        self.tables[name] = columns
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection, self.date = None, None
+            self.tables = {}
+
+sinks = {sink.name: sink for sink in [CsvSink, ParquetSink, ArrowSink, SqliteSink]}
+
+def getSink(name: str, **options):
+    '''
+    Returns an instance of the output sink registered as name created with options, accepted values: csv, parquet, arrow, sqlite
+    '''
+    if name not in sinks:
+        raise ValueError(f'invalid output sink: {name}, accepted values: {", ".join(sinks)}')
+    return sinks[name](**options)
@@ -0,0 +1,128 @@
+import logging, os, shutil, tempfile, bisect
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+class SnapshotStore:
+    '''
+    Append-only store of the option chains of every cycle. Each cycle is a chunk directory (directory/YYYYMMDD/HHMMSS) with one .npy file per column, rows sorted by (symbol, expiry, strike). Chunks are read memory-mapped, so queries only touch the pages of the rows they need and memory does not grow with the number of cycles.
+    Key columns are 'symbol' (str), 'expiry' (datetime64[D]) and 'strike' (float), every numeric column of the stored chains is kept as float. Day directories older than retentionDays are removed.
+    '''
+    keyColumns = ['symbol', 'expiry', 'strike']
+
+    def __init__(self, directory: str, retentionDays: int = 5) -> None:
+        self.directory = directory
+        self.retentionDays = retentionDays
+        os.makedirs(directory, exist_ok=True)
+        self.prune()
+        self.cycles = self._listCycles()
+
+    def _listCycles(self) -> list:
+        cycles = []
+        for day in sorted(os.listdir(self.directory)):
+            dayDir = os.path.join(self.directory, day)
+            if not (day.isdigit() and os.path.isdir(dayDir)):
+                continue
+            for cycle in sorted(os.listdir(dayDir)):
+                if cycle.isdigit():
+                    cycles.append(dt.datetime.strptime(day + cycle, '%Y%m%d%H%M%S'))
+        return cycles
+
+    def _cycleDir(self, timestamp: dt.datetime) -> str:
+        return os.path.join(self.directory, timestamp.strftime('%Y%m%d'), timestamp.strftime('%H%M%S'))
+
+    def prune(self, today: dt.date = None) -> None:
+        '''
+        Removes the day directories older than retentionDays.
+        '''
+        oldest = ((today or dt.date.today()) - dt.timedelta(days=self.retentionDays)).strftime('%Y%m%d')
+        for day in os.listdir(self.directory):
+            if day.isdigit() and day < oldest:
+                logging.info(f'removing snapshots of {day}')
+                shutil.rmtree(os.path.join(self.directory, day), ignore_errors=True)
+
+    def append(self, chainsDf: pd.DataFrame, timestamp: dt.datetime = None) -> dt.datetime:
+        '''
+        Stores chainsDf, option chains stacked with 'Symbol', 'expiryDate' (ISO date) and 'strikePrice' columns, as the snapshot of the cycle at timestamp. The chunk is written to a temp directory and renamed, so readers never see a partial cycle. Returns the timestamp of the snapshot.
+        '''
+        timestamp = (timestamp or dt.datetime.now()).replace(microsecond=0)
+        if self.cycles and timestamp <= self.cycles[-1]:
+            raise ValueError(f'snapshot at {timestamp} is not after the last snapshot at {self.cycles[-1]}')
+        if self.cycles and timestamp.date() != self.cycles[-1].date():
+            self.prune(timestamp.date())
+            self.cycles = self._listCycles()
+        chainsDf = chainsDf.sort_values(['Symbol', 'expiryDate', 'strikePrice'], kind='mergesort')
+        columns = {
+            'symbol': chainsDf['Symbol'].to_numpy(dtype=str),
+            'expiry': chainsDf['expiryDate'].to_numpy(dtype='datetime64[D]'),
+            'strike': pd.to_numeric(chainsDf['strikePrice'], errors='coerce').to_numpy(dtype=float)
+        }
+        for col in chainsDf.columns.drop(['Symbol', 'expiryDate', 'strikePrice']):
+            if pd.api.types.is_numeric_dtype(chainsDf[col]):
+                columns[col] = chainsDf[col].to_numpy(dtype=float)
+        cycleDir = self._cycleDir(timestamp)
+        dayDir = os.path.dirname(cycleDir)
+        os.makedirs(dayDir, exist_ok=True)
+        tmpDir = tempfile.mkdtemp(prefix='.~', dir=dayDir)
+        try:
+            for col, values in columns.items():
+                np.save(os.path.join(tmpDir, f'{col}.npy'), values)
+            os.replace(tmpDir, cycleDir)
+        except Exception:
+            shutil.rmtree(tmpDir, ignore_errors=True)
+            raise
+        self.cycles.append(timestamp)
+        logging.debug(f'stored snapshot of {len(chainsDf)} rows at {timestamp}')
+        return timestamp
+
+    def load(self, timestamp: dt.datetime, columns: list = None) -> dict:
+        '''
+        Returns a dict of column name to the memory-mapped array of the snapshot at timestamp, all columns when columns is None.
+        '''
+        cycleDir = self._cycleDir(timestamp)
+        if columns is None:
+            columns = [name[:-len('.npy')] for name in os.listdir(cycleDir) if name.endswith('.npy')]
+        return {col: np.load(os.path.join(cycleDir, f'{col}.npy'), mmap_mode='r') for col in columns}
+
+    def loadFrame(self, timestamp: dt.datetime, columns: list = None, symbol: str = None) -> pd.DataFrame:
+        '''
+        Returns the snapshot at timestamp as a dataframe with the key columns and columns, only the rows of symbol when given.
+        '''
+        if columns is not None:
+            columns = self.keyColumns + [col for col in columns if col not in self.keyColumns]
+        arrays = self.load(timestamp, columns)
+        rows = slice(None)
+        if symbol is not None:
+            symbols = arrays['symbol']
+            rows = slice(np.searchsorted(symbols, symbol, 'left'), np.searchsorted(symbols, symbol, 'right'))
+        return pd.DataFrame({col: np.array(values[rows]) for col, values in arrays.items()})
+
+    def oiChange(self, cyclesAgo: int = 1, field: str = 'openInterest') -> pd.DataFrame:
+        '''
+        Returns CE/PE field of the latest snapshot and its change since the snapshot cyclesAgo cycles before it, indexed by (symbol, expiry, strike). Contracts missing in the older snapshot have a NaN change.
+        '''
+        if cyclesAgo < 1 or len(self.cycles) <= cyclesAgo:
+            raise ValueError(f'{len(self.cycles)} snapshots stored, cannot compare with {cyclesAgo} cycles ago')
+        columns = [f'CE.{field}', f'PE.{field}']
+        latest = self.loadFrame(self.cycles[-1], columns).set_index(self.keyColumns)
+        previous = self.loadFrame(self.cycles[-1-cyclesAgo], columns).set_index(self.keyColumns)
+        change = latest[columns] - previous[columns].reindex(latest.index)
+        return latest[columns].join(change.add_suffix('.change'))
+
+    def series(self, symbol: str, columns: list, expiry: dt.date = None, strike: float = None, since: dt.datetime = None) -> pd.DataFrame:
+        '''
+        Returns the intraday series of columns for symbol, optionally of one expiry and strike, from the snapshots at or after since (midnight of today when None), with a 'timestamp' column.
+        '''
+        since = since or dt.datetime.combine(dt.date.today(), dt.time())
+        frames = []
+        for timestamp in self.cycles[bisect.bisect_left(self.cycles, since):]:
+            df = self.loadFrame(timestamp, columns, symbol)
+            if expiry is not None:
+                df = df[df['expiry'] == np.datetime64(expiry, 'D')]
+            if strike is not None:
+                df = df[df['strike'] == float(strike)]
+            df.insert(0, 'timestamp', timestamp)
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=['timestamp'] + self.keyColumns + list(columns))
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,298 @@
+import logging, os, tempfile
+import pandas as pd
+import datetime as dt
+from os.path import exists
+from metrics.metrics import timed
+
+try:
+    import xlwings as xw
+except ImportError:
+    xw = None
+
+try:
+    import openpyxl
+    from openpyxl.styles import Alignment
+    from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, get_column_letter
+    from openpyxl.worksheet.table import Table, TableStyleInfo
+except ImportError:
+    openpyxl = None
+
+def splitStartCell(startCell: str) -> tuple:
+    '''
+    Returns the timestamp cell and the cell below it where the data starts.
+    '''
+    timeStampCell = startCell
+    startCol = startCell[0]
+    startRow = str(int(startCell[1])+1)
+    return timeStampCell, startCol + startRow
+
+def timestampText() -> str:
+    return f'As on: {dt.datetime.now().strftime("%d/%m/%Y %H:%M:%S")}'
+
+def dataGrid(df: pd.DataFrame) -> list:
+    '''
+    Returns the header and rows of df as python values, NaN as None.
+    '''
+    values = df.astype(object).where(df.notna(), None).values.tolist()
+    return [[str(col) for col in df.columns]] + values
+
+def sameShape(grid: list, otherGrid: list) -> bool:
+    return otherGrid is not None and len(grid) == len(otherGrid) and len(grid[0]) == len(otherGrid[0])
+
+def diffRanges(oldGrid: list, newGrid: list) -> list:
+    '''
+    Returns the (row, col, values) blocks of newGrid, offsets from its top left cell, that differ from oldGrid of the same shape. Changed cells next to each other in a row form one block, blocks spanning the same columns in consecutive rows are merged.
+    '''
+    blocks, previousSpans = [], {}
+    for r, (oldRow, newRow) in enumerate(zip(oldGrid, newGrid)):
+        spans, c = {}, 0
+        while c < len(newRow):
+            start = c
+            while c < len(newRow) and (type(oldRow[c]) is not type(newRow[c]) or oldRow[c] != newRow[c]):
+                c += 1
+            if c == start:
+                c += 1
+                continue
+            block = previousSpans.get((start, c))
+            if block is None:
+                block = (r, start, [])
+                blocks.append(block)
+            block[2].append(newRow[start:c])
+            spans[(start, c)] = block
+        previousSpans = spans
+    return blocks
+
+class XlwingsBackend:
+    '''
+    Writes the workbook through a live Excel process using xlwings, requires Excel to be installed.
+    '''
+    name = 'xlwings'
+
+    def __init__(self) -> None:
+        if xw is None:
+            raise ImportError('xlwings is required for the xlwings output backend, use output_backend: openpyxl on hosts without Excel')
+        # sheet name -> grid last written to it, only the cells differing from it are written
+        self.lastGrids: dict = {}
+        self.outputFile = None
+        self.cellsWritten = 0
+        # workbooks created because the output file did not exist
+        self.workbooksCreated = 0
+
+    @timed('excel.open')
+    def open(self, outputFile: str):
+        if not exists(outputFile):
+            import xlsxwriter
+            logging.debug(f'{outputFile} does not exist, creating now.')
+            wb = xlsxwriter.Workbook(outputFile)
+            wb.close()
+            self.lastGrids = {}
+            self.workbooksCreated += 1
+        if outputFile != self.outputFile:
+            self.lastGrids, self.outputFile = {}, outputFile
+        return xw.Book(outputFile)
+
+    @timed('excel.save')
+    def save(self, wb, outputFile: str) -> None:
+        wb.save()
+
+    def hasSheet(self, wb, sheetName: str) -> bool:
+        return sheetName in [sh.name for sh in wb.sheets]
+
+    def _getSheet(self, wb, sheetName: str):
+        try:
+            return wb.sheets.add(sheetName)
+        except ValueError as e:
+            logging.warn(f'{e}')
+            return wb.sheets(sheetName)
+
+    def _writeTimestamp(self, sh, timeStampCell: str) -> None:
+        logging.info(f'updating timestamp for sheet: {sh.name}')
+        sh[timeStampCell].value = timestampText()
+        sh[timeStampCell].wrap_text = True
+
+    @timed('excel.writeTimestamp')
+    def writeTimestamp(self, wb, sheetName: str, startCell: str) -> None:
+        timeStampCell, _ = splitStartCell(startCell)
+        self._writeTimestamp(self._getSheet(wb, sheetName), timeStampCell)
+
+    @timed('excel.writeSheet')
+    def writeSheet(self, wb, sheetName: str, df: pd.DataFrame, startCell: str) -> None:
+        logging.debug(f'dataframe data: \n{df}')
+        timeStampCell, startCell = splitStartCell(startCell)
+        grid = dataGrid(df)
+        lastGrid = self.lastGrids.pop(sheetName, None)
+        try:
+            sh = self._getSheet(wb, sheetName)
+            start = sh.range(startCell)
+            if sameShape(grid, lastGrid):
+                for r, c, values in diffRanges(lastGrid, grid):
+                    sh.range((start.row + r, start.column + c)).value = values
+                    self.cellsWritten += len(values) * len(values[0])
+            else:
+                if lastGrid is not None:
+                    # clear what is left of a larger previous frame
+                    sh.range(start, (start.row + len(lastGrid) - 1, start.column + len(lastGrid[0]) - 1)).clear_contents()
+                start.options(pd.DataFrame, index=False, dates=False).value = df
+                self.cellsWritten += len(grid) * len(grid[0])
+            self.lastGrids[sheetName] = grid
+            logging.info(f'updated sheet: {sh.name}')
+            self._writeTimestamp(sh, timeStampCell)
+        except Exception as e:
+            logging.debug(f'error occured for sheet: {sheetName}')
+            raise e
+
+    @timed('excel.writeDashboardTable')
+    def writeDashboardTable(self, wb, sheetName: str, tableName: str, startCell: str, dataFrame: pd.DataFrame) -> None:
+        logging.debug(f'sheet name: {sheetName}')
+        logging.debug(f'dataframe to be written: \n{dataFrame}')
+        timeStampCell, startCell = splitStartCell(startCell)
+        sh = self._getSheet(wb, sheetName)
+        if dataFrame.columns.empty:
+            # nothing to show, keep the table with an empty body
+            if tableName in [table.name for table in sh.tables] and sh.tables[tableName].data_body_range is not None:
+                sh.tables[tableName].data_body_range.clear_contents()
+            logging.info(f'Dashboard sheet cleared: {tableName}')
+            self._writeTimestamp(sh, timeStampCell)
+            return
+        dataFrame = dataFrame.set_index(dataFrame.columns[0])
+        if tableName in [table.name for table in sh.tables]:
+            sh.tables[tableName].update(dataFrame)
+        else:
+            newTable = sh.tables.add(source=sh[startCell],
+                                    name=tableName).update(dataFrame)
+        logging.info(f'Dashboard sheet updated: {tableName}')
+        self._writeTimestamp(sh, timeStampCell)
+
+class OpenpyxlBackend:
+    '''
+    Builds the same workbook layout with openpyxl, without Excel. The workbook is saved to a temp file next to outputFile and renamed over it, so readers never see a partially written file.
+    '''
+    name = 'openpyxl'
+    tableStyle = 'TableStyleMedium2'
+
+    def __init__(self) -> None:
+        if openpyxl is None:
+            raise ImportError('openpyxl is required for the openpyxl output backend')
+        # sheet name -> grid last saved to it, only the cells differing from it are written
+        self.lastGrids: dict = {}
+        self.outputFile = None
+        self.cellsWritten = 0
+        # workbooks created because the output file did not exist
+        self.workbooksCreated = 0
+
+    @timed('excel.open')
+    def open(self, outputFile: str):
+        if outputFile != self.outputFile:
+            self.lastGrids, self.outputFile = {}, outputFile
+        if exists(outputFile):
+            return openpyxl.load_workbook(outputFile)
+        logging.debug(f'{outputFile} does not exist, creating now.')
+        self.lastGrids = {}
+        self.workbooksCreated += 1
+        wb = openpyxl.Workbook()
+        # sheets are added by the updates, drop the default one
+        wb.remove(wb.active)
+        return wb
+
+    @timed('excel.save')
+    def save(self, wb, outputFile: str) -> None:
+        outputDir = os.path.dirname(os.path.abspath(outputFile))
+        fd, tmpFile = tempfile.mkstemp(prefix='.~', suffix='.xlsx', dir=outputDir)
+        os.close(fd)
+        try:
+            wb.save(tmpFile)
+            os.replace(tmpFile, outputFile)
+        except Exception:
+            # the file on disk no longer matches the grids written
+            self.lastGrids = {}
+            if exists(tmpFile):
+                os.remove(tmpFile)
+            raise
+
+    def hasSheet(self, wb, sheetName: str) -> bool:
+        return sheetName in wb.sheetnames
+
+    def _getSheet(self, wb, sheetName: str):
+        if sheetName in wb.sheetnames:
+            return wb[sheetName]
+        return wb.create_sheet(sheetName)
+
+    def _writeTimestamp(self, ws, timeStampCell: str) -> None:
+        logging.info(f'updating timestamp for sheet: {ws.title}')
+        ws[timeStampCell] = timestampText()
+        ws[timeStampCell].alignment = Alignment(wrap_text=True)
+
+    @timed('excel.writeTimestamp')
+    def writeTimestamp(self, wb, sheetName: str, startCell: str) -> None:
+        timeStampCell, _ = splitStartCell(startCell)
+        self._writeTimestamp(self._getSheet(wb, sheetName), timeStampCell)
+
+    @staticmethod
+    def _writeGrid(ws, grid: list, row: int, col: int) -> None:
+        for r, rowValues in enumerate(grid, start=row):
+            for c, value in enumerate(rowValues, start=col):
+                ws.cell(row=r, column=c, value=value)
+
+    @timed('excel.writeSheet')
+    def writeSheet(self, wb, sheetName: str, df: pd.DataFrame, startCell: str) -> None:
+        logging.debug(f'dataframe data: \n{df}')
+        timeStampCell, startCell = splitStartCell(startCell)
+        col, row = coordinate_from_string(startCell)
+        col = column_index_from_string(col)
+        ws = self._getSheet(wb, sheetName)
+        grid = dataGrid(df)
+        lastGrid = self.lastGrids.pop(sheetName, None)
+        if sameShape(grid, lastGrid):
+            for r, c, values in diffRanges(lastGrid, grid):
+                self._writeGrid(ws, values, row + r, col + c)
+                self.cellsWritten += len(values) * len(values[0])
+        else:
+            # remove rows left over from a longer previous frame
+            if ws.max_row >= row:
+                ws.delete_rows(row, ws.max_row - row + 1)
+            self._writeGrid(ws, grid, row, col)
+            self.cellsWritten += len(grid) * len(grid[0])
+        self.lastGrids[sheetName] = grid
+        logging.info(f'updated sheet: {ws.title}')
+        self._writeTimestamp(ws, timeStampCell)
+
+    @timed('excel.writeDashboardTable')
+    def writeDashboardTable(self, wb, sheetName: str, tableName: str, startCell: str, dataFrame: pd.DataFrame) -> None:
+        logging.debug(f'sheet name: {sheetName}')
+        logging.debug(f'dataframe to be written: \n{dataFrame}')
+        timeStampCell, startCell = splitStartCell(startCell)
+        ws = self._getSheet(wb, sheetName)
+        if tableName in ws.tables:
+            # blank the previous table range, the other dashboard table shares the rows
+            for cells in ws[ws.tables[tableName].ref]:
+                for cell in cells:
+                    cell.value = None
+            del ws.tables[tableName]
+        if dataFrame.columns.empty:
+            # a table needs at least one column, leave the range blank
+            logging.info(f'Dashboard sheet cleared: {tableName}')
+            self._writeTimestamp(ws, timeStampCell)
+            return
+        grid = dataGrid(dataFrame)
+        if len(grid) == 1:
+            # a table needs at least one data row
+            grid.append([None]*len(grid[0]))
+        col, row = coordinate_from_string(startCell)
+        colIdx = column_index_from_string(col)
+        self._writeGrid(ws, grid, row, colIdx)
+        ref = f'{startCell}:{get_column_letter(colIdx + len(grid[0]) - 1)}{row + len(grid) - 1}'
+        table = Table(displayName=tableName, ref=ref)
+        table.tableStyleInfo = TableStyleInfo(name=self.tableStyle, showRowStripes=True)
+        ws.add_table(table)
+        logging.info(f'Dashboard sheet updated: {tableName}')
+        self._writeTimestamp(ws, timeStampCell)
+
+backends = {backend.name: backend for backend in [XlwingsBackend, OpenpyxlBackend]}
+
+def getBackend(name: str = 'xlwings'):
+    '''
+    Returns an instance of the output backend registered as name, accepted values: xlwings, openpyxl
+    '''
+    if name not in backends:
+        raise ValueError(f'invalid output backend: {name}, accepted values: {", ".join(backends)}')
+    return backends[name]()
@@ -0,0 +1,113 @@
+import logging, threading, time
+from xl_io.xlreadwrite import WorkbookSession
+
+try:
+    # COM has to be initialised on every thread that drives Excel
+    import pythoncom
+except ImportError:
+    pythoncom = None
+
+class BackgroundWriter:
+    '''
+    Writes the updates staged by WorkbookSession on a dedicated thread, so fetching and calculating the next cycle does not wait for Excel. Updates of the same sheet/table still pending are coalesced, only the newest frame is written. At most maxPending sheets/tables are pending, submit blocks until the writer catches up beyond that.
+    stats has the number of pending updates ('backlog'), the updates written and coalesced, the number of failed commits and the duration of the last commit. onError, when given, is called on the writer thread with the updates of every failed commit.
+    '''
+    def __init__(self, outputFile: str, backend, maxPending: int = 1000, onError=None) -> None:
+        self.outputFile = outputFile
+        self.backend = backend
+        self.maxPending = maxPending
+        self.onError = onError
+        self.stats = {'backlog': 0, 'written': 0, 'coalesced': 0, 'errors': 0, 'lastWriteSecs': None}
+        self._pending: dict = {}
+        self._writing = 0
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='output-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def backlog(self) -> int:
+        '''
+        Returns the number of updates submitted and not yet written.
+        '''
+        with self._condition:
+            return len(self._pending) + self._writing
+
+    def submit(self, updates: dict) -> None:
+        '''
+        Queues the updates of a WorkbookSession. A timestamp only update (df None) does not replace a pending update of the whole sheet.
+        '''
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError(f'writer for {self.outputFile} is shut down')
+            for key, update in updates.items():
+                while key not in self._pending and len(self._pending) >= self.maxPending:
+                    self._condition.wait()
+                if key in self._pending:
+                    if update['df'] is None and self._pending[key]['df'] is not None:
+                        continue
+                    self.stats['coalesced'] += 1
+                self._pending[key] = update
+            self.stats['backlog'] = len(self._pending) + self._writing
+            self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        '''
+        Waits until every submitted update is written. Returns False if timeout seconds passed first.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._writing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float = None) -> bool:
+        '''
+        Writes the pending updates and stops the writer thread. Returns False if they were not written within timeout seconds.
+        '''
+        flushed = self.flush(timeout)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        return flushed
+
+    def _run(self) -> None:
+        if pythoncom is not None:
+            pythoncom.CoInitialize()
+        try:
+            while True:
+                with self._condition:
+                    while not self._pending and not self._stopping:
+                        self._condition.wait()
+                    if not self._pending:
+                        return
+                    updates, self._pending = self._pending, {}
+                    self._writing = len(updates)
+                    self._condition.notify_all()
+                self._write(updates)
+        finally:
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
+
+    def _write(self, updates: dict) -> None:
+        start = time.monotonic()
+        try:
+            session = WorkbookSession(self.outputFile, self.backend)
+            session.updates = updates
+            session.commit()
+            self.stats['written'] += len(updates)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logging.warning(f'error occurred while writing {len(updates)} updates to {self.outputFile}: {e}')
+            if self.onError is not None:
+                self.onError(updates)
+        finally:
+            with self._condition:
+                self._writing = 0
+                self.stats['backlog'] = len(self._pending)
+                self.stats['lastWriteSecs'] = time.monotonic() - start
+                self._condition.notify_all()
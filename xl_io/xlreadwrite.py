@@ -1,98 +1,94 @@
-import logging, xlsxwriter
-from turtle import update
-import xlwings as xw
+import logging
 import pandas as pd
-import datetime as dt
-from os.path import exists
+from xl_io.backends import getBackend
 
 LOGLEVEL=logging.WARN
 
 logging.basicConfig(level=LOGLEVEL)
 
-def createUpdateSheet(outputFile: str, sheetName: str, df: pd.DataFrame, startCell: str = 'A1') -> None:
+class WorkbookSession:
+    '''
+    Stages every sheet and dashboard table update of a cycle and writes them to outputFile with a single open and a single save on commit. Staging the same sheet/table again replaces the earlier update. backend defaults to xlwings, see xl_io.backends.
+    With a writer (xl_io.writer.BackgroundWriter), commit hands the updates to it and returns without waiting for them to be written.
+    '''
+    def __init__(self, outputFile: str, backend=None, writer=None) -> None:
+        self.outputFile = outputFile
+        self.backend = backend or getBackend('xlwings')
+        self.writer = writer
+        self.updates: dict = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb) -> None:
+        if excType is None:
+            self.commit()
+        else:
+            logging.warning(f'discarding {len(self.updates)} staged updates for {self.outputFile}: {excValue}')
+            self.updates = {}
+
+    def updateSheet(self, sheetName: str, df: pd.DataFrame, startCell: str = 'A1') -> None:
+        '''
+        Stages df to be written to sheetName starting from cell startCell, with the timestamp in startCell.
+        '''
+        self.updates[(sheetName, None)] = {'sheetName': sheetName, 'tableName': None, 'startCell': startCell, 'df': df}
+
+    def touchSheet(self, sheetName: str, startCell: str = 'A1', df: pd.DataFrame = None) -> None:
+        '''
+        Stages an update of only the timestamp in startCell of sheetName, for sheets whose data did not change. An update of the whole sheet staged in the same cycle is kept. df, the data last written to the sheet, is written instead when the workbook has no sheetName, e.g. when it was deleted and created again.
+        '''
+        self.updates.setdefault((sheetName, None), {'sheetName': sheetName, 'tableName': None, 'startCell': startCell, 'df': None, 'sheetDf': df})
+
+    def updateDashboardTable(self, sheetName: str, tableName: str, startCell: str, dataFrame: pd.DataFrame) -> None:
+        '''
+        Stages dataFrame to be written to the table tableName in sheetName, with the timestamp in startCell.
+        '''
+        self.updates[(sheetName, tableName)] = {'sheetName': sheetName, 'tableName': tableName, 'startCell': startCell, 'df': dataFrame}
+
+    def commit(self) -> None:
+        '''
+        Opens the workbook once, applies all staged updates and saves it once.
+        '''
+        if not self.updates:
+            return
+        if self.writer is not None:
+            logging.debug(f'handing {len(self.updates)} updates for {self.outputFile} to the output writer')
+            self.writer.submit(self.updates)
+            self.updates = {}
+            return
+        logging.debug(f'committing {len(self.updates)} updates to {self.outputFile}')
+        wb = self.backend.open(self.outputFile)
+        try:
+            for update in self.updates.values():
+                if update['df'] is None and update.get('sheetDf') is not None and not self.backend.hasSheet(wb, update['sheetName']):
+                    logging.debug(f'{update["sheetName"]} is missing, writing it again')
+                    self.backend.writeSheet(wb, update['sheetName'], update['sheetDf'], update['startCell'])
+                elif update['df'] is None:
+                    self.backend.writeTimestamp(wb, update['sheetName'], update['startCell'])
+                elif update['tableName'] is None:
+                    self.backend.writeSheet(wb, update['sheetName'], update['df'], update['startCell'])
+                else:
+                    self.backend.writeDashboardTable(wb, update['sheetName'], update['tableName'], update['startCell'], update['df'])
+        finally:
+            self.backend.save(wb, self.outputFile)
+            logging.info(f'saved workbook: {self.outputFile}')
+            self.updates = {}
+
+def createUpdateSheet(outputFile: str, sheetName: str, df: pd.DataFrame, startCell: str = 'A1', backend=None) -> None:
     '''
     Creates/Updates excel sheet with the df DataFrame starting from cell startCell. Returns FileExists error if inputFile does not exist.
     '''
     logging.debug(f'inside createUpdateSheet')
-    logging.debug(f'dataframe data: \n{df}')
-    logging.debug(f'dataframe info: \n{df.info()}')
-    if not exists(outputFile):
-        logging.debug(f'{outputFile} does not exist, creating now.')
-        wb = xlsxwriter.Workbook(outputFile)
-        wb.close()
-    timeStampCell = startCell
-    startCol = startCell[0]
-    startRow = str(int(startCell[1])+1)
-    startCell = startCol + startRow
-    try:
-        wb = xw.Book(outputFile)
-        sh = None
-        try:
-            sh = wb.sheets.add(sheetName)
-        except ValueError as e:
-            logging.warn(f'{e}')
-            sh = wb.sheets(sheetName)
-        sh.range(startCell).options(pd.DataFrame, index=False, dates=False).value = df
-        logging.info(f'updated sheet: {sh.name}')
-        logging.info(f'updating timestamp for sheet: {sheetName}')
-        sh[timeStampCell].value = f'As on: {dt.datetime.now().strftime("%d/%m/%Y %H:%M:%S")}'
-        sh[timeStampCell].wrap_text = True
-        logging.info(f'saved workbook: {outputFile}')
-    except Exception as e:
-        logging.debug(f'error occured for sheet: {sheetName}')
-        raise e
-    finally:
-        wb.save()
-    #     wb.close()
+    with WorkbookSession(outputFile, backend) as session:
+        session.updateSheet(sheetName, df, startCell)
 
-def createUpdateDashboardTable(outputFile: str, sheetName: str, tableName: str, startCell: str, dataFrame: pd.DataFrame) -> None:
+def createUpdateDashboardTable(outputFile: str, sheetName: str, tableName: str, startCell: str, dataFrame: pd.DataFrame, backend=None) -> None:
     '''
     Creates or updates the dashboard table in a sheet with the data in dataFrame.
     '''
     logging.debug('inside createUpdateDashboardTable')
-    logging.debug(f'sheet name: {sheetName}')
-    logging.debug(f'dataframe to be written: \n{dataFrame}')
-    fileExists = exists(outputFile)
-    timeStampCell = startCell
-    startCol = startCell[0]
-    startRow = str(int(startCell[1])+1)
-    startCell = startCol + startRow
-    if not fileExists:
-        logging.debug(f'{outputFile} does not exist, creating now.')
-        wb = xlsxwriter.Workbook(outputFile)
-        logging.debug(f'{outputFile} does not exist, creating now.')
-        wb.close()
-    try:
-        wb = xw.Book(outputFile)
-        sh = None
-        try:
-            sh = wb.sheets.add(sheetName)
-        except ValueError as e:
-            logging.warn(f'{e}')
-            sh = wb.sheets(sheetName)
-        dataFrame = dataFrame.set_index(dataFrame.columns[0])
-        if tableName in [table.name for table in sh.tables]:
-            sh.tables[tableName].update(dataFrame)
-        else:
-            newTable = sh.tables.add(source=sh[startCell],
-                                    name=tableName).update(dataFrame)        
-        # sh.range(startCell).options(pd.DataFrame, index=False, header=True).value = dataFrame
-        # sh.range('C1:F1').merge()
-        # sh.range('A1').value = ['SYMBOL', 'STRIKE PRICE', 'ACTIVITY', 'ACTIVITY', 'ACTIVITY', 'ACTIVITY', 'SUPPORT 1', 'SUPPORT 2', 'RESISTANCE 1', 'RESISTANCE 2']
-        # sh.range('A1').expand('right').api.HorizontalAlignment = xw.constants.HAlign.xlHAlignCenter
-        # sh.tables.add(sh.range(startCell).expand('table'), table_style_name='TableStyleMedium13', has_headers=True, )
-        logging.info(f'Dashboard sheet updated: {tableName}')
-        logging.info(f'updating timestamp for sheet: {sheetName}')
-        sh[timeStampCell].value = f'As on: {dt.datetime.now().strftime("%d/%m/%Y %H:%M:%S")}'
-        sh[timeStampCell].wrap_text = True
-        logging.info(f'Workbook saved: {sh.name}')
-    except FileExistsError as e:
-        raise e
-    except Exception as e:
-        raise e
-    finally:
-        wb.save()
-    #     wb.close()
+    with WorkbookSession(outputFile, backend) as session:
+        session.updateDashboardTable(sheetName, tableName, startCell, dataFrame)
 
 # def _mergeSymbolCol(outputFile: str, sheetName: str, symbol: str, symbolColumn: str = 'A', symbolValueStartRow: int=2) -> None:
 #     '''